@@ -0,0 +1,82 @@
+"""
+work8.py 登录吞吐基准：在临时 SQLite 库中并发登录，测量吞吐与延迟，用于确定 worker / 哈希池的规模。
+
+    python bench_login.py --requests 200 --concurrency 8 --pool thread --workers 4
+
+哈希参数通过 PASSWORD_HASH_* 环境变量传给 work8.py（见 password_hashing.py），
+DATABASE_URL 指向临时库；两者都在导入 work8 之前设置，模型与请求钩子用的是同一个库。
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from password_hashing import POOLS
+
+USERNAME = "bench"
+PASSWORD = "bench-password"
+
+
+def run(total: int, concurrency: int) -> int:
+    """并发登录 total 次并打印结果；返回进程退出码（出现 302 / 503 以外的状态码时为 1）"""
+    import work8
+
+    work8.init_db()
+    with work8.db.connection_context():
+        work8.User.create(username=USERNAME, password_hash=work8.password_hasher.hash(PASSWORD))
+    app = work8.app
+
+    def one_login(_):
+        client = app.test_client()
+        began = time.perf_counter()
+        response = client.post("/login", data={"username": USERNAME, "password": PASSWORD})
+        return response.status_code, time.perf_counter() - began
+
+    began = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        results = list(executor.map(one_login, range(total)))
+    elapsed = time.perf_counter() - began
+
+    hasher = work8.password_hasher
+    hasher.shutdown()
+    if hasattr(work8.db, "close_all"):
+        work8.db.close_all()
+
+    statuses = Counter(status for status, _ in results)
+    latencies = sorted(latency for status, latency in results if status == 302)
+    print(f"🔐 {hasher.method}，pool={hasher.pool or 'inline'}，workers={hasher.workers}，"
+          f"max_pending={hasher.max_pending}，并发 {concurrency}")
+    if latencies:
+        p95 = latencies[int(len(latencies) * 0.95) - 1] if len(latencies) >= 20 else latencies[-1]
+        print(f"✅ 成功 {len(latencies)} 次，503 {statuses[503]} 次，{len(latencies) / elapsed:.1f} 次登录/秒，"
+              f"延迟 p50 {statistics.median(latencies) * 1e3:.0f} ms / p95 {p95 * 1e3:.0f} ms")
+    unexpected = {status: count for status, count in statuses.items() if status not in (302, 503)}
+    if unexpected:
+        print(f"❌ 出现异常状态码：{unexpected}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="测量 work8.py 并发登录的吞吐与延迟")
+    parser.add_argument("--requests", dest="total", type=int, default=200, help="登录请求总数")
+    parser.add_argument("--concurrency", type=int, default=8, help="并发发起登录的线程数")
+    parser.add_argument("--method", help="哈希参数，默认取 PASSWORD_HASH_METHOD")
+    parser.add_argument("--pool", choices=POOLS, help="哈希在哪里执行，默认取 PASSWORD_HASH_POOL")
+    parser.add_argument("--workers", type=int, help="哈希池大小")
+    parser.add_argument("--max-pending", type=int, help="同时进行的哈希运算上限")
+    args = parser.parse_args()
+
+    for name, value in (("METHOD", args.method), ("POOL", args.pool),
+                        ("WORKERS", args.workers), ("MAX_PENDING", args.max_pending)):
+        if value is not None:
+            os.environ[f"PASSWORD_HASH_{name}"] = str(value)
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = "sqlite+pool:///" + os.path.join(tmp, "bench.db")
+        code = run(args.total, args.concurrency)
+    sys.exit(code)
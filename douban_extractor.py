@@ -0,0 +1,361 @@
+"""
+豆瓣 Top250 列表页的电影信息提取（work2.py 导出 TXT 与 work3.py 入库共用）：
+每个 ``<li>`` 只解析一次，得到带类型的 MovieRecord；导演、主演、年份行都用
+预编译的正则提取，保证同一页面在两个脚本里得到完全相同的结果。
+
+提供 lxml 与 BeautifulSoup 两种后端，二者只在“如何在树上找到节点”上不同，
+字段的拆分与类型转换走同一段代码。lxml 后端使用预编译的 XPath 直接在 libxml2 树上
+取值，不构建 soup 对象，速度是 BeautifulSoup 后端的数倍。两种后端输出逐字段一致
+由 tests/test_douban_extractor.py 保证；直接运行本文件可对比两种后端的吞吐量：
+
+    python douban_extractor.py douban.html
+
+整个目录的解析可以用 parse_directory 分块交给多进程并行处理，结果按页码顺序返回；
+加上 --scaling 可在多核机器上测试不同进程数下的吞吐量：
+
+    python douban_extractor.py douban.html --scaling 400 --workers 1 2 4 8
+"""
+
+import argparse
+import os
+import re
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple
+
+from bs4 import BeautifulSoup
+from lxml import etree
+
+
+class MovieRecord(NamedTuple):
+    """一部电影的提取结果"""
+    title: str
+    rating: float
+    comment_num: int
+    director: str
+    actor: str
+    year: int  # 无法识别时为 0
+    country: str
+    genre: str
+    pic_link: str
+    douban_id: int = 0  # 链接 /subject/<id>/ 中的豆瓣条目 id，作为入库的自然键；无法识别时为 0
+
+    def to_txt_line(self) -> str:
+        """制表符分隔的一行（不含换行符），供 TXT 导出使用"""
+        return "\t".join(str(value) for value in (
+            self.title, self.rating, self.comment_num, self.director, self.actor,
+            self.year or "", self.country, self.genre, self.pic_link,
+        ))
+
+
+# 提取逻辑有变化时递增，使依赖提取结果的缓存（如 work2.py 的解析索引）失效
+EXTRACTOR_VERSION = 3
+
+
+# ========== 预编译正则 ==========
+_DIRECTOR_RE = re.compile(r"导演:\s*(.+?)(?:\s{2,}|主演:|$)")  # 导演与主演之间以多个 &nbsp; 分隔
+_ACTOR_RE = re.compile(r"主演:\s*(.+)")
+_YEAR_LINE_RE = re.compile(r"^(\d{4})")  # 年份 / 国家 / 类型 一行以四位年份开头
+_COMMENT_RE = re.compile(r"(\d+)人评价")
+_SUBJECT_RE = re.compile(r"/subject/(\d+)")
+
+
+def build_record(title: str, rating_text: str, comment_texts, info_lines, pic_link: str,
+                 link: str = "") -> MovieRecord:
+    """把从树上取到的原始文本转换为 MovieRecord（两种后端共用）
+
+    Args:
+        title: 主标题
+        rating_text: 评分文本，可能为空
+        comment_texts: 评分区域各 span 的文本，从中找出“xxx人评价”
+        info_lines: 简介段落中各文本行（已去空白、去空行）
+        pic_link: 海报链接
+        link: 电影详情页链接，从中取出豆瓣条目 id
+    """
+    rating = float(rating_text) if rating_text else 0.0
+
+    comment_num = 0
+    for text in comment_texts:
+        match = _COMMENT_RE.search(text)
+        if match:
+            comment_num = int(match.group(1))
+            break
+
+    director, actor, year, country, genre = "", "", 0, "", ""
+    for line in info_lines:
+        line = line.replace("\xa0", " ")
+        if "导演:" in line:
+            match = _DIRECTOR_RE.search(line)
+            director = match.group(1).strip() if match else ""
+            match = _ACTOR_RE.search(line)
+            actor = match.group(1).strip() if match else ""
+            continue
+        match = _YEAR_LINE_RE.match(line)
+        if match:
+            # 多个上映年份时形如 "1961 / 1964 / 中国大陆 / 剧情"，国家与类型取最后两段
+            parts = [part.strip() for part in line.split("/")]
+            year = int(match.group(1))
+            country = parts[-2] if len(parts) > 2 else ""
+            genre = parts[-1] if len(parts) > 1 else ""
+            break
+
+    match = _SUBJECT_RE.search(link or "")
+    douban_id = int(match.group(1)) if match else 0
+
+    return MovieRecord(title, rating, comment_num, director, actor, year, country, genre,
+                       pic_link or "", douban_id)
+
+
+# ========== lxml 后端 ==========
+def _has_class(name: str) -> str:
+    """生成匹配 class 属性中某个类名的 XPath 条件"""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+_MOVIE_ITEMS = etree.XPath(f"//ol[{_has_class('grid_view')}]//li")
+_TITLE = etree.XPath(f"(.//span[{_has_class('title')}])[1]")
+_RATING = etree.XPath(f"(.//span[{_has_class('rating_num')}])[1]")
+_BD = etree.XPath(f"(.//div[{_has_class('bd')}])[1]")
+_INFO_TEXTS = etree.XPath("(./p)[1]//text()")
+_SPAN_TEXTS = etree.XPath(".//span/text()")
+_IMG_SRC = etree.XPath("(.//img)[1]/@src")
+_LINK = etree.XPath("(.//a[@href])[1]/@href")
+_TEXT_NODES = etree.XPath(".//text()")
+
+
+def _text_strip(element) -> str:
+    """等价于 BeautifulSoup 的 get_text(strip=True)：逐个文本节点去空白后拼接"""
+    return "".join(s.strip() for s in _TEXT_NODES(element) if s.strip())
+
+
+def _first(results):
+    return results[0] if results else None
+
+
+def _parse_tree(html):
+    if isinstance(html, str):
+        return etree.HTML(html)
+    return etree.HTML(html, etree.HTMLParser(encoding="utf-8"))
+
+
+class _GridViewTarget:
+    """lxml 解析器 target：只记录 ol.grid_view 内是否出现过 li，不建树"""
+
+    def __init__(self) -> None:
+        self.depth = 0  # 当前所在 ol.grid_view（及其内部嵌套 ol）的层数
+        self.found = False
+
+    def start(self, tag, attrib) -> None:
+        if tag == "ol":
+            if self.depth or "grid_view" in (attrib.get("class") or "").split():
+                self.depth += 1
+        elif tag == "li" and self.depth:
+            self.found = True
+
+    def end(self, tag) -> None:
+        if tag == "ol" and self.depth:
+            self.depth -= 1
+
+    def data(self, data) -> None:
+        pass
+
+    def close(self) -> bool:
+        return self.found
+
+
+class MovieItemProbe:
+    """分块判断页面是否有 ol.grid_view li 条目（抓取分页的终止判断）
+
+    下载时每解压出一块就 feed 一块，close() 返回结果；解析器不建树，
+    内存占用与页面大小无关，找到条目后后续数据不再解析。
+    """
+
+    def __init__(self) -> None:
+        self._target = _GridViewTarget()
+        self._parser = etree.HTMLParser(target=self._target, encoding="utf-8")
+
+    def feed(self, data: bytes) -> None:
+        if data and not self._target.found:
+            self._parser.feed(data)
+
+    def close(self) -> bool:
+        try:
+            self._parser.close()
+        except etree.XMLSyntaxError:  # 空文档等无法解析的输入
+            pass
+        return self._target.found
+
+
+def extract_movies_lxml(html, source: str = "") -> list:
+    """lxml 后端：预编译 XPath 直接取值"""
+    root = _parse_tree(html)
+    if root is None:
+        return []
+    movies = []
+    for idx, movie in enumerate(_MOVIE_ITEMS(root), 1):
+        try:
+            title_tag = _first(_TITLE(movie))
+            if title_tag is None:
+                print(f"[跳过] {source} 第{idx}条未找到标题")
+                continue
+            rating_tag = _first(_RATING(movie))
+            bd = _first(_BD(movie))
+            movies.append(build_record(
+                _text_strip(title_tag),
+                _text_strip(rating_tag) if rating_tag is not None else "",
+                _SPAN_TEXTS(bd) if bd is not None else [],
+                [s.strip() for s in _INFO_TEXTS(bd) if s.strip()] if bd is not None else [],
+                str(_first(_IMG_SRC(movie)) or ""),
+                str(_first(_LINK(movie)) or ""),
+            ))
+        except Exception as e:
+            print(f"[跳过] {source} 第{idx}条解析失败：{e}")
+    return movies
+
+
+# ========== BeautifulSoup 后端 ==========
+def extract_movies_bs4(html, source: str = "") -> list:
+    """BeautifulSoup 后端：输出与 extract_movies_lxml 逐字段一致，作为对照实现保留"""
+    soup = BeautifulSoup(html, "lxml")
+    movies = []
+    for idx, movie in enumerate(soup.select("ol.grid_view li"), 1):  # 获取电影项列表
+        try:
+            title_tag = movie.find("span", class_="title")
+            if not title_tag:
+                print(f"[跳过] {source} 第{idx}条未找到标题")
+                continue
+            rating_tag = movie.find("span", class_="rating_num")
+            bd = movie.find("div", class_="bd")
+            p_tag = bd.find("p", recursive=False) if bd else None
+            img_tag = movie.find("img")
+            link_tag = movie.find("a", href=True)
+            movies.append(build_record(
+                title_tag.get_text(strip=True),
+                rating_tag.get_text(strip=True) if rating_tag else "",
+                [s for span in bd.find_all("span") for s in span.find_all(string=True, recursive=False)] if bd else [],
+                list(p_tag.stripped_strings) if p_tag else [],
+                img_tag.get("src") if img_tag else "",
+                link_tag["href"] if link_tag else "",
+            ))
+        except Exception as e:
+            print(f"[跳过] {source} 第{idx}条解析失败：{e}")
+    return movies
+
+
+BACKENDS = {
+    "bs4": extract_movies_bs4,
+    "lxml": extract_movies_lxml,
+}
+
+
+def extract_movies(html, source: str = "", backend: str = "lxml") -> list:
+    """按指定后端提取页面中的电影信息
+
+    Args:
+        html: 页面内容（str 或 UTF-8 bytes）
+        source: 来源文件名，仅用于提示信息
+        backend: "lxml"（默认，快速）或 "bs4"
+
+    Returns:
+        MovieRecord 列表，顺序与页面中一致
+    """
+    return BACKENDS[backend](html, source)
+
+
+# ========== 目录解析 ==========
+def _natural_key(file_name: str) -> list:
+    """page2 排在 page10 之前"""
+    return [int(part) if part.isdigit() else part for part in re.split(r"(\d+)", file_name)]
+
+
+def list_html_files(source_dir: str) -> list:
+    """目录下所有 HTML 文件名，按页码自然排序"""
+    return sorted((name for name in os.listdir(source_dir) if name.endswith(".html")), key=_natural_key)
+
+
+def parse_file(file_path: str, backend: str = "lxml") -> list:
+    """读取并解析单个 HTML 文件（也是多进程模式下子进程执行的任务）"""
+    with open(file_path, "rb") as f:
+        html = f.read()
+    return extract_movies(html, os.path.basename(file_path), backend)
+
+
+def parse_directory(source_dir: str, workers: int = 1, backend: str = "lxml",
+                    chunksize: int = 0):
+    """解析目录下所有 HTML 文件，逐个产出 (文件名, MovieRecord 列表)，顺序与页码一致
+
+    Args:
+        source_dir: HTML 文件所在目录
+        workers: 进程数；1 表示在当前进程内顺序解析
+        backend: 解析后端
+        chunksize: 每次派发给子进程的文件数，0 表示按文件数与进程数自动计算
+    """
+    return parse_files(source_dir, list_html_files(source_dir), workers, backend, chunksize)
+
+
+def parse_files(source_dir: str, file_names: list, workers: int = 1, backend: str = "lxml",
+                chunksize: int = 0):
+    """解析目录下指定的若干文件，逐个产出 (文件名, MovieRecord 列表)，顺序与 file_names 一致"""
+    paths = [os.path.join(source_dir, name) for name in file_names]
+    if workers <= 1 or len(paths) <= 1:
+        for name, path in zip(file_names, paths):
+            yield name, parse_file(path, backend)
+        return
+
+    chunksize = chunksize or max(1, len(paths) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # map 保证结果按提交顺序返回，子进程分块取任务以减少进程间通信
+        results = pool.map(parse_file, paths, [backend] * len(paths), chunksize=chunksize)
+        yield from zip(file_names, results)
+
+
+def _benchmark(html, rounds: int = 20) -> dict:
+    """各后端重复解析同一页面，返回每秒处理页数"""
+    speeds = {}
+    for name, func in BACKENDS.items():
+        began = time.perf_counter()
+        for _ in range(rounds):
+            func(html)
+        speeds[name] = rounds / (time.perf_counter() - began)
+    return speeds
+
+
+def _benchmark_scaling(html: str, copies: int, worker_counts: list) -> None:
+    """把同一页面复制 copies 份，测试不同进程数下解析整个目录的吞吐量"""
+    tmp_dir = tempfile.mkdtemp(prefix="douban_bench_")
+    try:
+        for i in range(copies):
+            with open(os.path.join(tmp_dir, f"douban_top250_page{i + 1}.html"), "w", encoding="utf-8") as f:
+                f.write(html)
+        baseline = None
+        for workers in worker_counts:
+            began = time.perf_counter()
+            total = sum(len(records) for _, records in parse_directory(tmp_dir, workers))
+            elapsed = time.perf_counter() - began
+            baseline = baseline or elapsed
+            print(f"  {workers:>2} 进程：{copies} 页 / {total} 部电影，用时 {elapsed:.2f}s，"
+                  f"{copies / elapsed:.1f} 页/秒，加速 {baseline / elapsed:.2f} 倍")
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="提取器吞吐量测试")
+    parser.add_argument("pages", nargs="*", default=["douban.html"], help="用于测试的 HTML 页面")
+    parser.add_argument("--scaling", type=int, default=0, help="多进程扩展性测试的页面份数（0 表示不测）")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="多进程测试的进程数")
+    args = parser.parse_args()
+
+    for path in args.pages:
+        with open(path, "r", encoding="utf-8") as f:
+            page = f.read()
+        count = len(extract_movies_lxml(page, path))
+        speeds = _benchmark(page)
+        print(f"⏱ {path}：{count} 部电影；"
+              f"bs4 {speeds['bs4']:.1f} 页/秒，lxml {speeds['lxml']:.1f} 页/秒，"
+              f"加速 {speeds['lxml'] / speeds['bs4']:.1f} 倍")
+        if args.scaling:
+            print(f"📈 多进程扩展性（CPU 核数 {os.cpu_count()}）：")
+            _benchmark_scaling(page, args.scaling, args.workers)
@@ -0,0 +1,60 @@
+"""
+gunicorn 配置：在 Linux / macOS 上以多进程 + 多线程运行 work5.py / work8.py。
+
+    gunicorn -c gunicorn.conf.py "work5:create_app()"
+    gunicorn -c gunicorn.conf.py "work8:create_app()"
+
+Windows 上没有 gunicorn，改用 serve.py（waitress）。
+监听地址、工作进程数、每进程线程数可用环境变量 WEB_BIND / WEB_WORKERS / WEB_THREADS 调整。
+work8 需设置环境变量 SECRET_KEY（会话签名密钥），否则拒绝启动。
+收到 SIGTERM 后停止接收新连接，进行中的请求最多再处理 graceful_timeout 秒。
+"""
+
+import multiprocessing
+import os
+import subprocess
+import sys
+
+bind = os.environ.get("WEB_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("WEB_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get("WEB_THREADS", 4))
+worker_class = "gthread"
+timeout = 60
+graceful_timeout = 30
+keepalive = 5
+# 每个工作进程处理一定数量的请求后重启，避免长期运行的内存增长
+max_requests = 2000
+max_requests_jitter = 200
+accesslog = "-"
+# 不预加载：每个工作进程各自导入应用、各自建立连接池（数据库连接不能跨 fork 共享）
+preload_app = False
+
+
+def _close_pool():
+    from db_config import db
+    if hasattr(db, "close_all"):
+        db.close_all()
+    elif not db.is_closed():
+        db.close()
+
+
+# 在子进程中导入应用模块并执行其 init_db（若有）
+_INIT_DB = "import importlib, sys; getattr(importlib.import_module(sys.argv[1]), 'init_db', lambda: None)()"
+
+
+def on_starting(server):
+    """主进程启动时执行一次应用模块的 init_db（若有）：建表、迁移
+
+    放在子进程中执行，主进程不导入应用：否则 fork 出的工作进程会直接沿用主进程的
+    sys.modules，相当于预加载，模块级创建的连接池、密码哈希进程池都会被所有工作进程共用。
+    """
+    app_uri = getattr(server.app, "app_uri", None) or server.cfg.wsgi_app
+    if not app_uri:
+        return
+    subprocess.run([sys.executable, "-c", _INIT_DB, app_uri.split(":", 1)[0]],
+                   cwd=server.cfg.chdir, check=True)
+
+
+def worker_exit(server, worker):
+    """工作进程退出时关闭连接池中的连接"""
+    _close_pool()
@@ -0,0 +1,56 @@
+"""
+豆瓣电影表的模型：work3.py 入库、work5.py / work8.py 查询共用同一份定义，
+表结构只在这里维护，建表和迁移由 prepare_movie_table 完成。
+
+year / rating / title 建索引：按年份查询、按评分筛选排序、按片名查找都不再全表扫描；
+douban_id 是豆瓣条目 id（自然键），重复导入时据此更新而不是新增。
+"""
+
+from peewee import CharField, FloatField, IntegerField, Model, TextField
+from playhouse.migrate import SchemaMigrator, migrate
+
+from db_config import db, migrate_indexes
+
+
+class DoubanMovie(Model):
+    title = CharField(max_length=100, index=True)
+    rating = FloatField(index=True)
+    comment_num = IntegerField()
+    director = TextField()
+    actor = CharField(max_length=100)
+    year = IntegerField(index=True)
+    country = CharField(max_length=50)
+    genre = CharField(max_length=100, null=True)
+    pic_link = TextField(null=True)
+    douban_id = IntegerField(unique=True)
+
+    class Meta:
+        database = db
+        table_name = 'douban_movie'
+
+
+def migrate_natural_key(model=DoubanMovie):
+    """为旧版本建好的表补上 douban_id 列；表不存在时什么也不做
+
+    旧数据没有保存详情页链接，补出来的列先允许为空，由 work3.backfill_natural_keys 回填；
+    唯一索引由 migrate_indexes 补上。
+    """
+    database = model._meta.database
+    table = model._meta.table_name
+    if not database.table_exists(table):
+        return
+    columns = {column.name for column in database.get_columns(table)}
+    missing = [f.column_name for f in model._meta.sorted_fields if f.column_name not in columns and f.name != "douban_id"]
+    if missing:
+        raise RuntimeError(f"已有的 {table} 表缺少列 {missing}，与当前模型不一致，请用 work3.py --mode replace 重建")
+    if "douban_id" not in columns:
+        migrator = SchemaMigrator.from_database(database)
+        migrate(migrator.add_column(table, "douban_id", IntegerField(null=True)))
+        print(f"🔧 已为 {table} 添加 douban_id 列")
+
+
+def prepare_movie_table(model=DoubanMovie):
+    """建表（不存在时）并把旧表迁移到当前结构，不会破坏现有数据"""
+    migrate_natural_key(model)
+    migrate_indexes(model)
+    model._meta.database.create_tables([model], safe=True)
@@ -0,0 +1,109 @@
+"""
+电影目录统计：按年份、年代、国家 / 地区、类型汇总的电影数、平均评分和评价人数。
+
+work3.py 每次入库后调用 rebuild_stats，把汇总结果整体重写进 movie_stats 表；
+Web 应用通过 LiveStats 按数据代号把整张汇总表读进内存，之后的统计请求直接查字典，
+不再对 douban_movie 做聚合。
+
+国家和类型是空格分隔的多值字段，一部电影会计入它所属的每个国家 / 类型。
+"""
+
+import threading
+from collections import defaultdict
+
+from peewee import CharField, FloatField, IntegerField, Model
+
+from db_config import db
+
+KINDS = ("year", "decade", "country", "genre")
+_NUMERIC_KINDS = ("year", "decade")  # 按键升序；其余按电影数降序
+
+
+class MovieStat(Model):
+    """一个统计分组：kind 为分组维度，key 为分组取值（如 kind=country, key=美国）"""
+    kind = CharField(max_length=20)
+    key = CharField(max_length=50)
+    movie_count = IntegerField()
+    avg_rating = FloatField()
+    comment_total = IntegerField()
+
+    class Meta:
+        database = db
+        table_name = 'movie_stats'
+        indexes = ((("kind", "key"), True),)
+
+
+def _group_keys(row):
+    year = row["year"]
+    if year:
+        yield "year", str(year)
+        yield "decade", f"{year // 10 * 10}s"
+    for country in (row["country"] or "").split():
+        yield "country", country
+    for genre in (row["genre"] or "").split():
+        yield "genre", genre
+
+
+def compute_stats(rows) -> list:
+    """由电影行（含 year / country / genre / rating / comment_num）计算全部分组，返回 MovieStat 字段字典"""
+    groups = defaultdict(lambda: [0, 0.0, 0])
+    for row in rows:
+        for group in _group_keys(row):
+            acc = groups[group]
+            acc[0] += 1
+            acc[1] += row["rating"] or 0
+            acc[2] += row["comment_num"] or 0
+    return [
+        {"kind": kind, "key": key, "movie_count": count,
+         "avg_rating": round(rating_sum / count, 2), "comment_total": comments}
+        for (kind, key), (count, rating_sum, comments) in groups.items()
+    ]
+
+
+def rebuild_stats(movie_model) -> int:
+    """从电影表重新计算并整体替换 movie_stats 表，返回分组数"""
+    query = movie_model.select(movie_model.year, movie_model.country, movie_model.genre,
+                               movie_model.rating, movie_model.comment_num).dicts()
+    stats = compute_stats(query)
+    db.create_tables([MovieStat])
+    with db.atomic():
+        MovieStat.delete().execute()
+        for start in range(0, len(stats), 500):
+            MovieStat.insert_many(stats[start:start + 500]).execute()
+    return len(stats)
+
+
+def load_stats() -> dict:
+    """读出整张汇总表：kind -> 已排序的分组列表；汇总表还未生成时各分组为空"""
+    result = {kind: [] for kind in KINDS}
+    if not MovieStat.table_exists():
+        return result
+    for row in MovieStat.select().dicts():
+        result.setdefault(row["kind"], []).append(
+            {name: row[name] for name in ("key", "movie_count", "avg_rating", "comment_total")})
+    for kind, items in result.items():
+        if kind in _NUMERIC_KINDS:
+            items.sort(key=lambda item: int(item["key"].rstrip("s")))
+        else:
+            items.sort(key=lambda item: (-item["movie_count"], item["key"]))
+    return result
+
+
+class LiveStats:
+    """按数据代号缓存 load_stats 的结果，数据重新导入后的下一次请求重新读取"""
+
+    def __init__(self, watcher) -> None:
+        self._watcher = watcher
+        self._stats = None
+        self._generation = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """返回 (数据代号, 统计字典)"""
+        generation = self._watcher.current()
+        if self._stats is None or generation != self._generation:
+            with self._lock:
+                if self._stats is None or generation != self._generation:
+                    self._stats = load_stats()
+                    self._generation = generation
+        return self._generation, self._stats
@@ -0,0 +1,110 @@
+"""
+密码哈希：参数可配置、登录时按新参数透明重算、可放进有界线程池 / 进程池执行。
+
+哈希算法与参数由 method 指定，格式同 werkzeug.security.generate_password_hash，
+如 "scrypt"、"scrypt:16384:8:1"、"pbkdf2:sha256:600000"。已存的哈希若与当前参数不一致，
+needs_rehash 返回 True，调用方在用户登录成功后用明文重新计算并保存。
+
+scrypt / pbkdf2 是刻意耗 CPU 的运算。pool="thread" / "process" 时交给容量为 workers 的池执行
+（hashlib 计算时释放 GIL，线程池即可利用多核），同时最多 max_pending 个运算排队或执行，
+超过时等待 wait 秒仍拿不到名额就抛出 HashBusy，由调用方返回 503，而不是让所有请求一起变慢。
+"""
+
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+POOLS = ("", "thread", "process")
+
+
+class HashBusy(Exception):
+    """同时进行的哈希运算已达上限"""
+
+
+class PasswordHasher:
+    """生成与校验密码哈希
+
+    Args:
+        method: 哈希算法与参数（见模块说明）
+        pool: "" 表示在调用线程中计算；"thread" / "process" 表示交给线程池 / 进程池
+        workers: 池的大小，默认为 CPU 核数
+        max_pending: 同时排队或执行的哈希运算上限，默认为 workers 的 4 倍
+        wait: 等待名额的最长秒数
+    """
+
+    def __init__(self, method: str = "scrypt", pool: str = "", workers: int = None,
+                 max_pending: int = None, wait: float = 5.0) -> None:
+        if pool not in POOLS:
+            raise ValueError(f"pool 只能是 {POOLS}")
+        self.method = method
+        self.pool = pool
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending or self.workers * 4
+        self.wait = wait
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._executor = None
+        self._executor_pid = None  # 创建池的进程
+        self._executor_lock = threading.Lock()
+        # 当前参数生成的哈希的前缀（"$" 之前的部分），用于判断旧哈希是否需要重算
+        self._prefix = generate_password_hash("", method).split("$", 1)[0]
+
+    def _get_executor(self):
+        """第一次使用时在当前进程创建池
+
+        模块级创建的 PasswordHasher 可能随 fork 被多个进程继承（如 gunicorn 工作进程），
+        父进程的进程池（其任务 / 结果队列）不能跨进程共享，因此按 pid 判断，在每个进程里各建一个。
+        """
+        if not self.pool:
+            return None
+        pid = os.getpid()
+        if self._executor_pid != pid:
+            with self._executor_lock:
+                if self._executor_pid != pid:
+                    if self.pool == "thread":
+                        self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="password-hash")
+                    else:
+                        self._executor = ProcessPoolExecutor(self.workers)
+                    self._executor_pid = pid
+        return self._executor
+
+    def _run(self, func, *args):
+        if not self._slots.acquire(timeout=self.wait):
+            raise HashBusy()
+        try:
+            executor = self._get_executor()
+            if executor is None:
+                return func(*args)
+            return executor.submit(func, *args).result()
+        finally:
+            self._slots.release()
+
+    def hash(self, password: str) -> str:
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, password_hash: str, password: str) -> bool:
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash: str) -> bool:
+        return password_hash.split("$", 1)[0] != self._prefix
+
+    def shutdown(self) -> None:
+        if self._executor is not None and self._executor_pid == os.getpid():
+            self._executor.shutdown()
+            self._executor = self._executor_pid = None
+
+
+def hasher_from_env() -> PasswordHasher:
+    """按环境变量 PASSWORD_HASH_METHOD / PASSWORD_HASH_POOL / PASSWORD_HASH_WORKERS /
+    PASSWORD_HASH_MAX_PENDING 创建 PasswordHasher"""
+    def int_env(name):
+        value = os.environ.get(name)
+        return int(value) if value else None
+
+    return PasswordHasher(
+        method=os.environ.get("PASSWORD_HASH_METHOD", "scrypt"),
+        pool=os.environ.get("PASSWORD_HASH_POOL", ""),
+        workers=int_env("PASSWORD_HASH_WORKERS"),
+        max_pending=int_env("PASSWORD_HASH_MAX_PENDING"),
+    )
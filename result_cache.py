@@ -0,0 +1,65 @@
+"""
+进程内结果缓存：容量有限的 LRU，条目超过 TTL 后失效。
+
+work5.py 用它缓存 /search_api 的查询结果。缓存键中带有数据代号（见 db_config.GenerationWatcher），
+work3.py 重新入库后代号变化，旧条目不会再被命中，随后按 LRU 被挤出。
+work8.py 用它缓存 Flask-Login 加载的用户，登出时用 pop 显式失效。
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class TTLCache:
+    """线程安全的 LRU + TTL 缓存
+
+    Attributes:
+        maxsize: 最多保存的条目数，超出时淘汰最久未使用的条目
+        ttl: 条目的存活秒数
+        hits / misses: 命中与未命中次数
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = 300.0, clock=time.monotonic) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._clock = clock
+        self._data = OrderedDict()  # key -> (过期时刻, value)
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                expires, value = entry
+                if self._clock() < expires:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value) -> None:
+        with self._lock:
+            self._data[key] = (self._clock() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        """删除并返回 key 对应的值（不论是否过期）；不存在时返回 default"""
+        with self._lock:
+            entry = self._data.pop(key, _MISSING)
+        return default if entry is _MISSING else entry[1]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
@@ -0,0 +1,52 @@
+"""
+用 waitress 运行 work5.py / work8.py：跨平台（Windows 也可用），单进程多线程。
+
+    python serve.py work5 --port 8000 --threads 8
+    python serve.py work8 --port 8001
+
+Linux / macOS 上需要利用多核时用 gunicorn（见 gunicorn.conf.py）。
+work8 需设置环境变量 SECRET_KEY（会话签名密钥），否则拒绝启动。
+数据库查询、密码哈希等运算会释放 GIL，多线程即可并行处理请求。
+Ctrl+C 或 SIGTERM 时停止接收新连接，等待进行中的请求（最多 5 秒）后关闭连接池退出。
+"""
+
+import argparse
+import importlib
+import os
+import signal
+
+from waitress import create_server
+
+APPS = ("work5", "work8")
+
+
+def _graceful_exit(signum, frame):
+    # waitress 收到 KeyboardInterrupt 后会等待工作线程处理完手上的请求
+    raise KeyboardInterrupt
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="用 waitress 运行 Web 应用（关闭调试模式）")
+    parser.add_argument("app", choices=APPS, help="要运行的应用")
+    parser.add_argument("--host", default=os.environ.get("WEB_HOST", "0.0.0.0"), help="监听地址")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("WEB_PORT", 8000)), help="监听端口")
+    parser.add_argument("--threads", type=int, default=int(os.environ.get("WEB_THREADS", 8)), help="工作线程数")
+    parser.add_argument("--connection-limit", type=int, default=200, help="同时保持的最大连接数")
+    args = parser.parse_args()
+
+    module = importlib.import_module(args.app)
+    if hasattr(module, "init_db"):
+        module.init_db()
+    application = module.create_app()
+
+    server = create_server(application, host=args.host, port=args.port, threads=args.threads,
+                           connection_limit=args.connection_limit)
+    signal.signal(signal.SIGTERM, _graceful_exit)
+    print(f"🚀 {args.app} 运行于 http://{args.host}:{args.port}（{args.threads} 线程），Ctrl+C 停止")
+    try:
+        server.run()
+    finally:
+        from db_config import db
+        if hasattr(db, "close_all"):
+            db.close_all()
+        print("👋 已停止")
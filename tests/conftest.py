@@ -0,0 +1,37 @@
+"""测试直接导入仓库根目录下的脚本模块（work1.py、douban_extractor.py 等）
+
+各模块共用 db_config.db，后端在导入时由 DATABASE_URL 决定：这里先指向临时目录中的 SQLite，
+测试不会连到本地 MySQL；需要数据库的测试用 database fixture 各自换一个新的库文件。
+"""
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="python_lesson_tests_"), "test.db")
+
+
+@pytest.fixture
+def database(tmp_path):
+    """每个测试一个新的 SQLite 库文件，各模块的模型和 Flask 请求钩子都用它"""
+    from db_config import SQLITE_PRAGMAS, db
+    if not db.is_closed():
+        db.close()
+    db.init(str(tmp_path / "test.db"), pragmas=SQLITE_PRAGMAS)
+    yield db
+    if not db.is_closed():
+        db.close()
+
+
+@pytest.fixture
+def inventory(tmp_path):
+    """只有一页 douban.html 的 HTML 目录（work3.py 的输入）"""
+    source_dir = tmp_path / "inventory"
+    source_dir.mkdir()
+    with open(os.path.join(ROOT, "douban.html"), "rb") as f:
+        (source_dir / "douban_top250_page1.html").write_bytes(f.read())
+    return str(source_dir)
@@ -0,0 +1,33 @@
+"""douban_extractor.py：两种后端逐字段一致"""
+
+import os
+
+import pytest
+
+from douban_extractor import extract_movies, extract_movies_bs4, extract_movies_lxml
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope="module")
+def page():
+    with open(os.path.join(ROOT, "douban.html"), "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def test_lxml_matches_bs4_field_for_field(page):
+    expected = extract_movies_bs4(page)
+    assert expected
+    assert extract_movies_lxml(page) == expected
+
+
+def test_bytes_input_matches_text_input(page):
+    assert extract_movies(page.encode("utf-8")) == extract_movies(page)
+
+
+def test_records_are_typed(page):
+    movie = extract_movies(page)[0]
+    assert movie.title
+    assert isinstance(movie.rating, float) and movie.rating > 0
+    assert isinstance(movie.year, int) and movie.year > 1900
+    assert movie.douban_id > 0
@@ -0,0 +1,32 @@
+"""movie_models.py：work8.py 先建表后，work3.py 仍能按 douban_id 增量入库"""
+
+import work3
+import work8
+from movie_models import DoubanMovie, prepare_movie_table
+
+
+def load(inventory):
+    prepare_movie_table()
+    return work3.extract_and_store_html_to_db(inventory, upsert=True)
+
+
+def test_loader_runs_after_web_app_init_db(database, inventory):
+    work8.init_db()
+    columns = {column.name for column in database.get_columns(DoubanMovie._meta.table_name)}
+    assert columns == {field.column_name for field in DoubanMovie._meta.sorted_fields}
+
+    assert load(inventory) == 25
+    movie = DoubanMovie.get(DoubanMovie.title == "肖申克的救赎")
+    user = work8.User.create(username="u", password_hash="x")
+    work8.Collection.create(user=user, movie=movie)
+
+    # 重复导入按 douban_id 更新，id 不变，收藏仍指向同一部电影
+    assert load(inventory) == 25
+    assert DoubanMovie.select().count() == 25
+    assert work8.Collection.get().movie.title == "肖申克的救赎"
+
+
+def test_init_db_keeps_loaded_movies(database, inventory):
+    assert load(inventory) == 25
+    work8.init_db()
+    assert DoubanMovie.select().count() == 25
@@ -0,0 +1,118 @@
+"""work1.py 抓取管道：用进程内的 http.server 代替豆瓣"""
+
+import gzip
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+import work1
+from douban_extractor import extract_movies
+from work1 import (CHANGED, FAILED, MANIFEST_FILE, UNCHANGED, CrawlPipeline, FileSink,
+                   PageNumberPaginator, parse_retry_after)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """按路径分发到 server.routes[path](page)，返回 (状态码, 头, 响应体, 声明的长度或 None)"""
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        page = int(parse_qs(url.query).get("page", ["1"])[0])
+        status, headers, body, length = self.server.routes[url.path](page)
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body) if length is None else length))
+        self.end_headers()
+        self.wfile.write(body)
+        self.close_connection = True
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    httpd.routes = {}
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _douban_page():
+    with open(os.path.join(ROOT, "douban.html"), "rb") as f:
+        return f.read()
+
+
+def crawl(server, path, out_dir, pages=1, **options):
+    base_url = f"http://127.0.0.1:{server.server_port}{path}"
+    pipeline = CrawlPipeline(PageNumberPaginator(base_url, max_pages=pages), FileSink(str(out_dir)),
+                             workers=2, rate=1000, max_retries=0, **options)
+    return pipeline.run()
+
+
+def test_connection_dropped_mid_body_fails_the_page(server, tmp_path):
+    # 声明的长度比实际发送的多，客户端读到一半连接关闭
+    server.routes["/short"] = lambda page: (200, {}, b"<html>" * 100, 10_000)
+    results = crawl(server, "/short", tmp_path)
+    assert [r.outcome for r in results] == [FAILED]
+    assert not any(name.endswith(".part") for name in os.listdir(tmp_path))
+
+
+def test_truncated_gzip_fails_the_page(server, tmp_path):
+    compressed = gzip.compress(_douban_page())
+    truncated = compressed[:len(compressed) // 2]
+    server.routes["/gzip"] = lambda page: (200, {"Content-Encoding": "gzip"}, truncated, None)
+    results = crawl(server, "/gzip", tmp_path)
+    assert [r.outcome for r in results] == [FAILED]
+    assert not any(name.endswith(".part") for name in os.listdir(tmp_path))
+
+
+def test_crawls_until_empty_page(server, tmp_path):
+    html = _douban_page()
+    server.routes["/top250"] = lambda page: (200, {}, html if page <= 3 else b"<html><body></body></html>", None)
+    results = crawl(server, "/top250", tmp_path, pages=None, page_name="p{page}.html")
+    assert [r.outcome for r in results] == [CHANGED] * 3
+    assert sorted(n for n in os.listdir(tmp_path) if n.endswith(".html")) == ["p1.html", "p2.html", "p3.html"]
+    with open(tmp_path / MANIFEST_FILE, encoding="utf-8") as f:
+        assert json.load(f)["changed"] == ["p1.html", "p2.html", "p3.html"]
+
+    # 第二次抓取：内容不变，不重写文件
+    results = crawl(server, "/top250", tmp_path, pages=None, page_name="p{page}.html")
+    assert [r.outcome for r in results] == [UNCHANGED] * 3
+
+
+def test_static_server_recipe_with_pages(server, tmp_path):
+    # 模块说明中的本地测试方式：静态服务器忽略查询参数，每页都是 douban.html
+    html = _douban_page()
+    server.routes["/douban.html"] = lambda page: (200, {}, html, None)
+    results = crawl(server, "/douban.html", tmp_path, pages=3)
+    assert [r.outcome for r in results] == [CHANGED] * 3
+    assert extract_movies(html)  # 保存的页面可以直接交给提取器
+
+
+def test_unbounded_crawl_stops_at_max_pages(server, tmp_path, monkeypatch):
+    monkeypatch.setattr(work1, "MAX_PAGES", 5)
+    html = _douban_page()
+    server.routes["/douban.html"] = lambda page: (200, {}, html, None)
+    results = crawl(server, "/douban.html", tmp_path, pages=None)
+    assert len(results) == 5
+
+
+def test_unbounded_crawl_stops_when_a_batch_fails(server, tmp_path):
+    server.routes["/missing"] = lambda page: (404, {}, b"not found", None)
+    results = crawl(server, "/missing", tmp_path, pages=None)
+    assert [r.outcome for r in results] == [FAILED, FAILED]  # 只抓了第一批（workers=2）
+
+
+@pytest.mark.parametrize("value, expected", [("5", 5.0), ("²", None), ("soon", None), (None, None)])
+def test_parse_retry_after(value, expected):
+    assert parse_retry_after(value) == expected
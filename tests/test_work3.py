@@ -0,0 +1,20 @@
+"""work3.py：按年份查询走 year 索引（EXPLAIN 检查）"""
+
+from movie_models import DoubanMovie, prepare_movie_table
+from work3 import check_year_index
+
+
+def test_year_lookup_uses_index(database):
+    prepare_movie_table()
+    used, plan = check_year_index(DoubanMovie)
+    assert used, plan
+
+
+def test_migration_adds_missing_year_index(database):
+    prepare_movie_table()
+    database.execute_sql('DROP INDEX "doubanmovie_year"')
+    assert not check_year_index(DoubanMovie)[0]
+
+    prepare_movie_table()
+    used, plan = check_year_index(DoubanMovie)
+    assert used, plan
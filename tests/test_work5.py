@@ -0,0 +1,59 @@
+"""work5.py：/search_api 的参数校验与游标分页"""
+
+import base64
+import json
+
+import pytest
+
+import work5
+from movie_models import DoubanMovie, prepare_movie_table
+
+
+@pytest.fixture
+def client(database):
+    prepare_movie_table()
+    work5.search_cache.clear()
+    work5.generation._checked = float("-inf")  # 每个测试换了新库，数据代号要重新读取
+    DoubanMovie.insert_many([
+        {"title": f"电影{i}", "year": 1990 + i, "rating": 8 + i / 10, "comment_num": i, "director": "导演",
+         "actor": "演员", "country": "中国大陆", "douban_id": i}
+        for i in range(1, 6)
+    ]).execute()
+    work5.app.config["TESTING"] = True
+    return work5.app.test_client()
+
+
+def cursor(*values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip("=")
+
+
+@pytest.mark.parametrize("year", ["²", "-1", "1.5", "99999999999999999999999"])
+def test_bad_integer_argument_is_rejected(client, year):
+    response = client.get("/search_api", query_string={"year": year})
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "参数 year 必须是非负整数"}
+
+
+@pytest.mark.parametrize("value", [
+    ["-rating", [1], 5],
+    ["-rating", {"a": 1}, 5],
+    ["id", 1, True],
+    ["title", 5, 3],
+    ["id", 2 ** 70, 1],
+])
+def test_crafted_cursor_is_rejected(client, value):
+    sort = value[0]
+    response = client.get("/search_api", query_string={"sort": sort, "cursor": cursor(*value)})
+    assert response.status_code == 400
+
+
+def test_cursor_pagination_visits_every_movie(client):
+    seen = []
+    params = {"sort": "-rating", "limit": 2}
+    while True:
+        body = client.get("/search_api", query_string=params).get_json()
+        seen.extend(movie["id"] for movie in body["movies"])
+        if not body["next_cursor"]:
+            break
+        params["cursor"] = body["next_cursor"]
+    assert seen == [5, 4, 3, 2, 1]
@@ -0,0 +1,88 @@
+"""work8.py：搜索、收藏页与批量收藏接口"""
+
+import pytest
+
+import work8
+from movie_models import DoubanMovie
+
+
+@pytest.fixture
+def client(database):
+    work8.init_db()
+    work8.user_cache.clear()
+    work8.generation._checked = float("-inf")  # 每个测试换了新库，数据代号要重新读取
+    DoubanMovie.insert_many([
+        {"title": f"电影{i}", "year": 1990 + i, "rating": 9.0, "comment_num": 0, "director": "导演",
+         "actor": "演员", "country": "中国大陆", "douban_id": i}
+        for i in range(1, 6)
+    ]).execute()
+    work8.User.create(username="tester", password_hash=work8.password_hasher.hash("secret"))
+    app = work8.app
+    app.config["TESTING"] = True
+    client = app.test_client()
+    response = client.post("/login", data={"username": "tester", "password": "secret"})
+    assert response.status_code == 302
+    return client
+
+
+@pytest.mark.parametrize("year", ["²", "١٩٩١", "99999999999999999999999", "-1", "abc"])
+def test_search_with_unusable_year_is_no_match(client, year):
+    response = client.post("/search", data={"year": year})
+    assert response.status_code == 200
+
+
+def test_search_by_year(client):
+    response = client.post("/search", data={"year": "1991"})
+    assert response.status_code == 200
+    assert "电影1" in response.get_data(as_text=True)
+
+
+def count_queries(database, monkeypatch, client, path):
+    """请求 path 期间执行的 SQL 条数（请求钩子与模型用的是同一个 database）"""
+    executed = []
+    execute_sql = database.execute_sql
+    monkeypatch.setattr(database, "execute_sql",
+                        lambda sql, *args, **kwargs: executed.append(sql) or execute_sql(sql, *args, **kwargs))
+    response = client.get(path)
+    monkeypatch.undo()
+    assert response.status_code == 200
+    return len(executed)
+
+
+def test_collection_page_query_count_does_not_grow(client, database, monkeypatch):
+    user = work8.User.get(work8.User.username == "tester")
+    client.get("/my_collection")  # 预热：登录用户进入缓存后，之后的请求只剩收藏页本身的查询
+    counts = {}
+    for total in (1, 20, 500):
+        start = work8.Collection.select().count()
+        DoubanMovie.insert_many([
+            {"title": f"收藏{i}", "year": 2000, "rating": 8.0, "comment_num": 0, "director": "",
+             "actor": "", "country": "", "douban_id": 1000 + i}
+            for i in range(start, total)
+        ]).execute()
+        movie_ids = [m.id for m in DoubanMovie.select(DoubanMovie.id).where(DoubanMovie.douban_id >= 1000)]
+        work8.collect_movies(user.id, movie_ids)
+        assert work8.Collection.select().count() == total
+        counts[total] = count_queries(database, monkeypatch, client, "/my_collection")
+    assert len(set(counts.values())) == 1, counts
+    assert counts[500] <= 2, counts
+
+
+def test_collection_page_is_paginated(client):
+    work8.collect_movies(work8.User.get().id, [m.id for m in DoubanMovie.select()])
+    # 超出范围的页码被限制在 COLLECTION_MAX_PAGE，返回空页而不是 500
+    response = client.get("/my_collection?page=99999999999999999999")
+    assert response.status_code == 200
+    assert "没有更多收藏了" in response.get_data(as_text=True)
+    assert "电影5" in client.get("/my_collection").get_data(as_text=True)
+
+
+def test_create_app_requires_secret_key(monkeypatch):
+    monkeypatch.delenv("SECRET_KEY", raising=False)
+    monkeypatch.setattr(work8.app, "secret_key", work8.DEV_SECRET_KEY)
+    monkeypatch.setitem(work8.app.config, "TESTING", False)
+    with pytest.raises(RuntimeError):
+        work8.create_app()
+
+    monkeypatch.setenv("SECRET_KEY", "from-env")
+    assert work8.create_app().secret_key == "from-env"
@@ -1,42 +1,725 @@
-import requests
+"""
+豆瓣电影 Top250 抓取脚本：
+使用有界线程池并发抓取分页，所有线程共用一个带连接池的 Session（keep-alive），
+并通过令牌桶限速，保证整体请求频率不超过设定值。
+
+抓取流程封装为 CrawlPipeline：
+- 分页器（OffsetPaginator / PageNumberPaginator）负责生成每页 URL，
+  未指定页数时一直抓到某页没有 ``ol.grid_view li`` 条目为止；
+- 输出端（FileSink / ArchiveSink / MemorySink）决定页面写成散落的 HTML 文件、
+  单个 zip 压缩包，还是直接在内存中交给解析函数，省去落盘再读取。
+
+使用 FileSink 时，目标目录下的 .http_cache.json 记录每个 URL 的 ETag / Last-Modified
+与内容哈希，再次抓取时发送条件请求，收到 304 或内容未变时不重写文件；本次有变化
+的页面写入 changed_pages.json，供下游只处理增量。
+
+临时失败（网络异常、429、5xx）按指数退避加抖动重试，并遵守 Retry-After；
+已完成的页面记录在 .crawl_checkpoint.json，中断后重跑会从断点继续。
+
+下载采用 stream=True 按块读取原始字节，根据 Content-Encoding 选择增量解压器
+（br / gzip / deflate），解压后的数据直接写入输出端，不在内存中保留两份页面。
+
+本地测试时可用 ``python -m http.server`` 提供 douban.html，再指定
+``--base-url http://127.0.0.1:8000/douban.html --pages 3``。静态服务器忽略查询参数，
+每页都返回同一份有条目的页面，必须用 --pages 限定页数（未限定时最多抓 MAX_PAGES 页）。
+tests/test_work1.py 用进程内的 http.server 按同样的方式测试整条管道。
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
 import time
-import os  # 新增：用于目录操作
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Callable, NamedTuple, Optional
+
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+
+from douban_extractor import MovieItemProbe, extract_movies
+
+try:
+    import brotli
+except ImportError:  # 未安装 brotli 时只声明 gzip / deflate
+    brotli = None
 
 
 headers = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0 Safari/537.36",
-    "Accept-Encoding": "br, gzip, deflate",  # 支持 Brotli 解码
+    "Accept-Encoding": "br, gzip, deflate" if brotli else "gzip, deflate",  # 支持 Brotli 解码
 }
 
-# 目标保存目录（修改后的路径）
-target_dir = r"C:\Users\CK\Desktop\inventory"
+# 目标保存目录（可用环境变量 DOUBAN_INVENTORY_DIR 覆盖）
+target_dir = os.environ.get("DOUBAN_INVENTORY_DIR", r"C:\Users\CK\Desktop\inventory")
 
-for page in range(10):
-    start = page * 25
-    url = f"https://movie.douban.com/top250?start={start}"
-    print(f"📥 正在抓取第 {page + 1} 页：{url}")
+BASE_URL = "https://movie.douban.com/top250"
+PAGE_SIZE = 25
+PAGE_NAME = "douban_top250_page{page}.html"
+ARCHIVE_NAME = "douban_top250.zip"
+CHUNK_SIZE = 64 * 1024
+CACHE_FILE = ".http_cache.json"
+MANIFEST_FILE = "changed_pages.json"
+CHECKPOINT_FILE = ".crawl_checkpoint.json"
 
-    response = requests.get(url, headers=headers)
+# 重试策略：指数退避 base * 2^(n-1)，上限 cap 秒，再加全抖动
+MAX_RETRIES = 4
+BACKOFF_BASE = 1.0
+BACKOFF_CAP = 30.0
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
 
-    if response.status_code == 200:
-        # 尝试 Brotli 解码
-        try:
-            import brotli
-            content = brotli.decompress(response.content).decode("utf-8")
-        except:
-            content = response.text
+# 未指定页数时最多抓取的页数，防止分页参数被服务器忽略时无限抓下去
+MAX_PAGES = 1000
+
+# 单页抓取结果
+CHANGED = "changed"
+UNCHANGED = "unchanged"
+EMPTY = "empty"  # 页面没有电影条目，表示分页已到末尾
+FAILED = "failed"
+RETRY = "retry"  # 仅在单次请求内部使用，表示可重试的失败
+
+
+class TokenBucket:
+    """令牌桶限速器（线程安全）
+
+    Attributes:
+        rate: 每秒补充的令牌数，即长期平均请求频率
+        capacity: 桶容量，即允许的最大突发请求数
+    """
+
+    def __init__(self, rate: float, capacity: int = 1) -> None:
+        if rate <= 0:
+            raise ValueError("rate 必须大于 0")
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """取走一个令牌，桶空时阻塞到有令牌为止"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class PageCache:
+    """按 URL 索引的 HTTP 缓存（线程安全）
+
+    每条记录包含 etag、last_modified、sha256 与页面名，持久化到 JSON 文件；
+    cache_path 为 None 时只在内存中生效。
+    """
+
+    def __init__(self, cache_path: Optional[str]) -> None:
+        self.cache_path = cache_path
+        self._lock = threading.Lock()
+        self._entries = _load_json(cache_path)
+
+    def get(self, url: str) -> dict:
+        with self._lock:
+            return dict(self._entries.get(url, {}))
+
+    def conditional_headers(self, url: str) -> dict:
+        """生成条件请求头（If-None-Match / If-Modified-Since）"""
+        entry = self.get(url)
+        conditional = {}
+        if entry.get("etag"):
+            conditional["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            conditional["If-Modified-Since"] = entry["last_modified"]
+        return conditional
+
+    def update(self, url: str, response: requests.Response, sha256: str, name: str) -> None:
+        with self._lock:
+            self._entries[url] = {
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "sha256": sha256,
+                "name": name,
+            }
+
+    def save(self) -> None:
+        with self._lock:
+            _dump_json(self.cache_path, self._entries)
+
+
+class Checkpoint:
+    """抓取断点：记录已完成的 URL 及其结果，中断后重跑时跳过这些 URL（线程安全）
+
+    path 为 None 时不落盘（非文件输出端无法跨进程续抓）。
+    """
+
+    def __init__(self, path: Optional[str]) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._done = _load_json(path)
+
+    def get(self, url: str):
+        with self._lock:
+            return self._done.get(url)
+
+    def mark_done(self, url: str, outcome: str) -> None:
+        """记录一个完成的 URL 并立即落盘"""
+        with self._lock:
+            self._done[url] = outcome
+            _dump_json(self.path, self._done)
+
+    def clear(self) -> None:
+        """整轮抓取全部完成后删除断点文件"""
+        with self._lock:
+            self._done = {}
+            if self.path:
+                _remove_quietly(self.path)
+
+
+def _load_json(path: Optional[str]) -> dict:
+    if not path:
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
 
-        # 构造完整文件路径（修改后的目录）
-        file_path = os.path.join(target_dir, f"douban_top250_page{page + 1}.html")
 
+def _dump_json(path: Optional[str], data: dict) -> None:
+    """原子写入 JSON 文件；path 为 None 时什么也不做"""
+    if not path:
+        return
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _remove_quietly(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+# ========== 分页器 ==========
+class OffsetPaginator:
+    """偏移量分页：第 page 页（从 0 开始）的 URL 为 base_url?param=page*page_size
+
+    Attributes:
+        max_pages: 最多抓取页数；None 表示一直抓到空页为止
+    """
+
+    def __init__(self, base_url: str = BASE_URL, page_size: int = PAGE_SIZE,
+                 param: str = "start", max_pages: Optional[int] = None) -> None:
+        self.base_url = base_url
+        self.page_size = page_size
+        self.param = param
+        self.max_pages = max_pages
+
+    def url(self, page: int) -> str:
+        separator = "&" if "?" in self.base_url else "?"
+        return f"{self.base_url}{separator}{self.param}={page * self.page_size}"
+
+
+class PageNumberPaginator(OffsetPaginator):
+    """页码分页：第 page 页（从 0 开始）的 URL 为 base_url?param=page+first"""
+
+    def __init__(self, base_url: str, param: str = "page", first: int = 1,
+                 max_pages: Optional[int] = None) -> None:
+        super().__init__(base_url, 1, param, max_pages)
+        self.first = first
+
+    def url(self, page: int) -> str:
+        separator = "&" if "?" in self.base_url else "?"
+        return f"{self.base_url}{separator}{self.param}={page + self.first}"
+
+
+# ========== 输出端 ==========
+class FileSink:
+    """每页保存为目录下的一个 HTML 文件（支持条件请求缓存与断点续抓）"""
+
+    persistent = True
+
+    def __init__(self, out_dir: str = target_dir) -> None:
+        self.out_dir = out_dir
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.out_dir, name)
+
+    def exists(self, name: str) -> bool:
+        return os.path.exists(self.path(name))
+
+    def open(self, name: str):
         # 自动创建目标目录（关键新增逻辑）
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        os.makedirs(self.out_dir, exist_ok=True)
+        return open(self.path(name) + ".part", "wb+")
+
+    def commit(self, name: str, handle) -> str:
+        # 原子替换，避免留下半截文件
+        handle.close()
+        os.replace(self.path(name) + ".part", self.path(name))
+        return self.path(name)
+
+    def discard(self, name: str, handle) -> None:
+        handle.close()
+        _remove_quietly(self.path(name) + ".part")
+
+    def close(self) -> None:
+        pass
+
+
+class ArchiveSink:
+    """所有页面写入同一个 zip 压缩包（每次运行重新生成）"""
+
+    persistent = False
+
+    def __init__(self, archive_path: str) -> None:
+        self.archive_path = archive_path
+        os.makedirs(os.path.dirname(archive_path) or ".", exist_ok=True)
+        self._zip = zipfile.ZipFile(archive_path, "w", compression=zipfile.ZIP_DEFLATED)
+        self._lock = threading.Lock()
+
+    def exists(self, name: str) -> bool:
+        return False
+
+    def open(self, name: str):
+        # 超过 1MB 才落到临时文件，写入压缩包时再顺序拷贝
+        return tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+
+    def commit(self, name: str, handle) -> str:
+        handle.seek(0)
+        with self._lock, self._zip.open(name, "w") as member:
+            shutil.copyfileobj(handle, member, CHUNK_SIZE)
+        handle.close()
+        return f"{self.archive_path}:{name}"
+
+    def discard(self, name: str, handle) -> None:
+        handle.close()
+
+    def close(self) -> None:
+        self._zip.close()
+
+
+class MemorySink:
+    """页面保留在内存中，提交时直接交给 consumer(name, html_bytes)，不经过文件系统
+
+    未提供 consumer 时页面保存在 pages 字典中。consumer 在抓取线程中被调用。
+    """
+
+    persistent = False
+
+    def __init__(self, consumer: Optional[Callable[[str, bytes], None]] = None) -> None:
+        self.consumer = consumer
+        self.pages = {}
+
+    def exists(self, name: str) -> bool:
+        return False
+
+    def open(self, name: str):
+        return io.BytesIO()
+
+    def commit(self, name: str, handle) -> str:
+        data = handle.getvalue()
+        if self.consumer is not None:
+            self.consumer(name, data)
+        else:
+            self.pages[name] = data
+        return f"memory:{name}"
+
+    def discard(self, name: str, handle) -> None:
+        handle.close()
+
+    def close(self) -> None:
+        pass
+
+
+def build_session(pool_size: int) -> requests.Session:
+    """创建共享 Session：连接池大小与线程数一致，连接保持 keep-alive 复用"""
+    session = requests.Session()
+    session.headers.update(headers)
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+# ========== 流式解压 ==========
+class StreamDecoder:
+    """按 Content-Encoding 逐块解压响应体
+
+    多重编码（如 "gzip, br"）按声明的逆序依次解压；identity 或空值表示未压缩。
+
+    Raises:
+        ValueError: 遇到不支持的编码时抛出
+    """
+
+    def __init__(self, content_encoding: str) -> None:
+        codings = [c.strip().lower() for c in content_encoding.split(",")]
+        self._stages = [self._new_stage(c) for c in reversed(codings) if c and c != "identity"]
+
+    @staticmethod
+    def _new_stage(coding: str):
+        if coding in ("gzip", "x-gzip"):
+            return _GzipStage()
+        if coding == "deflate":
+            return _DeflateStage()
+        if coding == "br" and brotli is not None:
+            return _BrotliStage()
+        raise ValueError(f"不支持的内容编码：{coding}")
+
+    def decompress(self, chunk: bytes) -> bytes:
+        for stage in self._stages:
+            chunk = stage.decompress(chunk)
+        return chunk
+
+    def flush(self) -> bytes:
+        data = b""
+        for stage in self._stages:
+            data = stage.decompress(data) + stage.flush() if data else stage.flush()
+        return data
+
+
+class _GzipStage:
+    """gzip 增量解压，flush 时检查数据流是否完整"""
+
+    def __init__(self) -> None:
+        self._obj = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    def decompress(self, chunk: bytes) -> bytes:
+        return self._obj.decompress(chunk)
+
+    def flush(self) -> bytes:
+        data = self._obj.flush()
+        if not self._obj.eof:  # 连接中途断开时 zlib 不会报错，只是没读到流的结尾
+            raise ValueError("gzip 数据流不完整")
+        return data
+
+
+class _DeflateStage:
+    """deflate 解压：标准为 zlib 封装，兼容部分服务器发送的裸 deflate 流"""
+
+    def __init__(self) -> None:
+        self._obj = zlib.decompressobj()
+        self._started = False
+
+    def decompress(self, chunk: bytes) -> bytes:
+        if not self._started and chunk:
+            self._started = True
+            try:
+                return self._obj.decompress(chunk)
+            except zlib.error:
+                self._obj = zlib.decompressobj(-zlib.MAX_WBITS)
+        return self._obj.decompress(chunk)
+
+    def flush(self) -> bytes:
+        data = self._obj.flush()
+        if not self._obj.eof:
+            raise ValueError("deflate 数据流不完整")
+        return data
+
+
+class _BrotliStage:
+    """brotli 增量解压，接口与 zlib 解压对象保持一致"""
+
+    def __init__(self) -> None:
+        self._obj = brotli.Decompressor()
+
+    def decompress(self, chunk: bytes) -> bytes:
+        return self._obj.process(chunk)
+
+    def flush(self) -> bytes:
+        if not self._obj.is_finished():
+            raise ValueError("brotli 数据流不完整")
+        return b""
+
+
+# 解压 / 写盘阶段可能出现的异常
+DECODE_ERRORS = (OSError, ValueError, zlib.error) + ((brotli.error,) if brotli else ())
+# response.raw.stream() 绕过了 requests 的异常封装，读响应体时连接断开等错误以 urllib3 异常抛出
+STREAM_ERRORS = (requests.RequestException, urllib3.exceptions.HTTPError) + DECODE_ERRORS
+
+
+def stream_to(response: requests.Response, handle, probe=None) -> str:
+    """边下载边解压写入 handle，返回解压后内容的 sha256；给出 probe 时每块解压数据也 feed 给它"""
+    decoder = StreamDecoder(response.headers.get("Content-Encoding", ""))
+    digest = hashlib.sha256()
+    for chunk in response.raw.stream(CHUNK_SIZE, decode_content=False):
+        data = decoder.decompress(chunk)
+        if data:
+            digest.update(data)
+            handle.write(data)
+            if probe is not None:
+                probe.feed(data)
+    data = decoder.flush()
+    digest.update(data)
+    handle.write(data)
+    if probe is not None:
+        probe.feed(data)
+    return digest.hexdigest()
+
+
+# ========== 重试 ==========
+class FetchResult(NamedTuple):
+    """单个 URL 的抓取结果与统计"""
+    page: int
+    url: str
+    outcome: str
+    attempts: int
+    latency: float  # 各次请求耗时之和（秒），不含退避与限速等待
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """解析 Retry-After 头（秒数或 HTTP 日期），返回需要等待的秒数"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdecimal():  # isdigit 接受 "²" 等 float() 无法解析的字符
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+def backoff_delay(attempt: int, base: float = BACKOFF_BASE, cap: float = BACKOFF_CAP,
+                  retry_after: Optional[float] = None) -> float:
+    """第 attempt 次失败后的等待时间：指数退避 + 全抖动，服务器给出 Retry-After 时不早于它"""
+    delay = random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
+
+
+# ========== 抓取管道 ==========
+class CrawlPipeline:
+    """分页抓取管道：分页器生成 URL，线程池并发下载，结果写入输出端
+
+    Attributes:
+        paginator: 分页器，提供 url(page) 与 max_pages
+        sink: 输出端，FileSink / ArchiveSink / MemorySink
+        item_probe: 无参函数，返回页面判空探针（feed 分块数据，close() 返回 False 时丢弃该页并视为分页结束）
+    """
+
+    def __init__(self, paginator=None, sink=None, workers: int = 4, rate: float = 1.0,
+                 burst: int = 1, max_retries: int = MAX_RETRIES,
+                 page_name: str = PAGE_NAME,
+                 item_probe: Callable[[], MovieItemProbe] = MovieItemProbe) -> None:
+        self.paginator = paginator or OffsetPaginator(max_pages=10)
+        self.sink = sink or FileSink()
+        self.workers = workers
+        self.max_retries = max_retries
+        self.page_name = page_name
+        self.item_probe = item_probe
+        self.bucket = TokenBucket(rate, burst)
+        # 只有落盘的输出端才能利用条件请求缓存与断点续抓
+        state_dir = self.sink.out_dir if self.sink.persistent else None
+        self.cache = PageCache(os.path.join(state_dir, CACHE_FILE) if state_dir else None)
+        self.checkpoint = Checkpoint(os.path.join(state_dir, CHECKPOINT_FILE) if state_dir else None)
+        self.session = None
+
+    def run(self) -> list:
+        """抓取所有分页，返回每页的 FetchResult 列表（按页码顺序，不含末尾空页）
+
+        未限定页数时按线程数分批抓取，某批出现空页、整批都失败或达到 MAX_PAGES 页即停止。
+        全部页面成功后删除断点文件；有页面失败时保留断点，重跑只抓剩余页面。
+        """
+        results = []
+        self.session = build_session(self.workers)
+        try:
+            with self.session, ThreadPoolExecutor(max_workers=self.workers) as pool:
+                page = 0
+                bounded = self.paginator.max_pages is not None
+                max_pages = self.paginator.max_pages if bounded else MAX_PAGES
+                while page < max_pages:
+                    end = max_pages if bounded else min(page + self.workers, max_pages)
+                    batch = list(pool.map(self.fetch_page, range(page, end)))
+                    finished = next((i for i, r in enumerate(batch) if r.outcome == EMPTY), None)
+                    results.extend(batch if finished is None else batch[:finished])
+                    if finished is not None:
+                        break
+                    if not bounded and all(r.outcome == FAILED for r in batch):
+                        print(f"⛔ 第 {page + 1}-{end} 页全部失败，停止抓取\n")
+                        break
+                    page = end
+                else:
+                    if not bounded:
+                        print(f"⛔ 已抓取 {max_pages} 页仍未遇到空页，停止抓取（可用 --pages 指定页数）\n")
+        finally:
+            self.sink.close()
+        self.cache.save()
+        if self.sink.persistent:
+            write_manifest(self.sink.out_dir, results, self.page_name)
+        if all(result.outcome != FAILED for result in results):
+            self.checkpoint.clear()
+        return results
+
+    def fetch_page(self, page: int) -> FetchResult:
+        """抓取并保存单页，失败时按指数退避重试，成功后写入断点"""
+        url = self.paginator.url(page)
+        previous = self.checkpoint.get(url)
+        if previous is not None:
+            print(f"⏭ 第 {page + 1} 页已在上次抓取中完成，跳过")
+            return FetchResult(page, url, previous, 0, 0.0)
+
+        latency = 0.0
+        attempts = 0
+        outcome = FAILED
+        while attempts <= self.max_retries:
+            attempts += 1
+            self.bucket.acquire()  # 避免请求过快被封
+            print(f"📥 正在抓取第 {page + 1} 页（第 {attempts} 次）：{url}")
+            began = time.perf_counter()
+            outcome, retry_after = self._fetch_once(page, url)
+            latency += time.perf_counter() - began
+            if outcome != RETRY:
+                break
+            if attempts <= self.max_retries:
+                delay = backoff_delay(attempts, retry_after=retry_after)
+                print(f" 第 {page + 1} 页 {delay:.1f}s 后重试\n")
+                time.sleep(delay)
+        else:
+            outcome = FAILED
+            print(f" 第 {page + 1} 页重试 {self.max_retries} 次后仍失败\n")
+
+        if outcome != FAILED:
+            self.checkpoint.mark_done(url, outcome)
+            self.cache.save()
+        return FetchResult(page, url, outcome, attempts, latency)
+
+    def _fetch_once(self, page: int, url: str) -> tuple:
+        """发起一次请求，返回 (结果, Retry-After 秒数)；可重试的失败返回 RETRY"""
+        name = self.page_name.format(page=page + 1)
+        known = self.sink.exists(name)
+        conditional = self.cache.conditional_headers(url) if known else {}
+        handle = None
+        try:
+            with self.session.get(url, headers=conditional, timeout=10, stream=True) as response:
+                if response.status_code == 304:
+                    print(f" 第 {page + 1} 页未修改（304），跳过写入\n")
+                    return UNCHANGED, None
+
+                if response.status_code in RETRYABLE_STATUS:
+                    print(f" 第 {page + 1} 页暂时失败，状态码：{response.status_code}")
+                    return RETRY, parse_retry_after(response.headers.get("Retry-After"))
+
+                if response.status_code != 200:
+                    print(f" 第 {page + 1} 页抓取失败，状态码：{response.status_code}\n")
+                    return FAILED, None
+
+                handle = self.sink.open(name)
+                probe = self.item_probe()
+                digest = stream_to(response, handle, probe)
+        except STREAM_ERRORS as e:
+            print(f" 第 {page + 1} 页下载或解码失败：{e}")
+            if handle is not None:
+                self.sink.discard(name, handle)
+            return RETRY, None
+
+        cached = self.cache.get(url)
+        if known and cached.get("sha256") == digest:
+            self.sink.discard(name, handle)
+            # 内容相同但 ETag / Last-Modified 可能已更新，记下新的校验值，下次才能得到 304
+            self.cache.update(url, response, digest, name)
+            print(f" 第 {page + 1} 页内容未变化，跳过写入\n")
+            return UNCHANGED, None
+
+        # 判空随下载分块完成，不再把整页读回内存
+        if not probe.close():
+            self.sink.discard(name, handle)
+            print(f" 第 {page + 1} 页没有电影条目，分页结束\n")
+            return EMPTY, None
+
+        self.cache.update(url, response, digest, name)
+        location = self.sink.commit(name, handle)
+        print(f" 第 {page + 1} 页保存成功：{location}\n")
+        return CHANGED, None
+
+
+def write_manifest(out_dir: str, results: list, page_name: str = PAGE_NAME) -> str:
+    """写出本轮内容有变化的页面清单（含断点续抓前已完成的页面），返回清单路径
+
+    page_name 须与抓取时的页面命名模板一致，清单中的文件名才能对应到实际文件。
+    """
+    changed = [
+        page_name.format(page=result.page + 1)
+        for result in results if result.outcome == CHANGED
+    ]
+    manifest_path = os.path.join(out_dir, MANIFEST_FILE)
+    _dump_json(manifest_path, {"generated_at": time.time(), "changed": changed})
+    return manifest_path
+
+
+def print_report(results: list) -> None:
+    """打印每个 URL 的请求次数与耗时，用于根据数据调整限速参数"""
+    print(f"{'页码':>4}  {'结果':<9}  {'次数':>4}  {'耗时(ms)':>9}  URL")
+    for result in results:
+        print(f"{result.page + 1:>4}  {result.outcome:<9}  {result.attempts:>4}  "
+              f"{result.latency * 1000:>9.1f}  {result.url}")
+    fetched = sorted(r.latency for r in results if r.attempts)
+    if fetched:
+        p95 = fetched[min(len(fetched) - 1, int(len(fetched) * 0.95))]
+        retries = sum(r.attempts - 1 for r in results if r.attempts)
+        print(f"平均耗时 {sum(fetched) / len(fetched) * 1000:.1f}ms，P95 {p95 * 1000:.1f}ms，重试 {retries} 次")
+
+
+def crawl(pages: Optional[int] = 10, workers: int = 4, rate: float = 1.0, burst: int = 1,
+          base_url: str = BASE_URL, out_dir: str = target_dir,
+          max_retries: int = MAX_RETRIES) -> list:
+    """抓取 Top250 页面保存到 out_dir，pages 为 None 时抓到空页为止"""
+    pipeline = CrawlPipeline(OffsetPaginator(base_url, max_pages=pages), FileSink(out_dir),
+                             workers, rate, burst, max_retries)
+    return pipeline.run()
+
+
+def _print_movies(name: str, html: bytes) -> None:
+    """内存输出端的示例消费者：页面不落盘，直接交给提取器解析"""
+    movies = extract_movies(html, name)
+    print(f"🧾 {name}：{len(movies)} 部电影，首部《{movies[0].title if movies else '-'}》")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="并发抓取豆瓣电影 Top250")
+    parser.add_argument("--pages", type=int, default=None, help=f"抓取页数（默认抓到空页为止，最多 {MAX_PAGES} 页）")
+    parser.add_argument("--workers", type=int, default=4, help="并发线程数")
+    parser.add_argument("--rate", type=float, default=1.0, help="每秒最多请求数")
+    parser.add_argument("--burst", type=int, default=1, help="允许的突发请求数")
+    parser.add_argument("--retries", type=int, default=MAX_RETRIES, help="单页最大重试次数")
+    parser.add_argument("--base-url", default=BASE_URL, help="列表页地址")
+    parser.add_argument("--page-size", type=int, default=PAGE_SIZE, help="每页条目数（偏移量步长）")
+    parser.add_argument("--target-dir", default=target_dir, help="输出目录")
+    parser.add_argument("--sink", choices=["files", "archive", "memory"], default="files",
+                        help="输出方式：HTML 文件 / zip 压缩包 / 内存直接解析")
+    args = parser.parse_args()
 
-        # 保存文件
-        with open(file_path, "w", encoding="utf-8") as f:
-            f.write(content)
-        print(f" 第 {page + 1} 页保存成功：{file_path}\n")
+    if args.sink == "archive":
+        output = ArchiveSink(os.path.join(args.target_dir, ARCHIVE_NAME))
+    elif args.sink == "memory":
+        output = MemorySink(_print_movies)
     else:
-        print(f" 第 {page + 1} 页抓取失败，状态码：{response.status_code}\n")
+        output = FileSink(args.target_dir)
 
-    time.sleep(1)  # 避免请求过快被封
\ No newline at end of file
+    began = time.perf_counter()
+    results = CrawlPipeline(OffsetPaginator(args.base_url, args.page_size, max_pages=args.pages),
+                            output, args.workers, args.rate, args.burst, args.retries).run()
+    print_report(results)
+    outcomes = [result.outcome for result in results]
+    print(f"✅ 完成 {len(outcomes) - outcomes.count(FAILED)}/{len(outcomes)} 页"
+          f"（变化 {outcomes.count(CHANGED)} 页），用时 {time.perf_counter() - began:.2f}s")
@@ -1,76 +1,240 @@
+"""
+豆瓣电影信息导出：解析 HTML 目录，写入制表符分隔的 douban_extracted.txt。
+
+源目录下的 .parse_index.json 记录每个 HTML 文件的 mtime、大小、内容哈希以及
+从中提取出的电影记录。再次运行时未变化的文件直接复用记录，只有新增或修改过的
+页面才会重新解析，输出文件由索引重建。
+
+加上 --columnar 还会输出带类型的列式文件：评分为浮点数，评论人数与年份为整数，
+导演 / 主演 / 类型拆成字符串列表。安装了 pyarrow 时写 Parquet 或 Arrow IPC
+（可内存映射、按列过滤），否则退化为 gzip 压缩的 CSV（列表列以 "|" 连接）。
+"""
+
+import argparse
+import csv
+import gzip
+import hashlib
+import json
 import os
-from bs4 import BeautifulSoup
+import re
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # 未安装 pyarrow 时只能输出压缩 CSV
+    pa = None
+
+from douban_extractor import BACKENDS, EXTRACTOR_VERSION, MovieRecord, list_html_files, parse_files
 
 # 设置新的 HTML 文件夹路径和输出 TXT 文件路径
-source_dir = r"C:\Users\CK\Desktop\inventory"  # 修改为目标目录
-output_file = os.path.join(source_dir, "douban_extracted.txt")  # 输出文件仍放在该目录下
-
-# 检查源目录是否存在，不存在则创建（避免文件读取错误）
-if not os.path.exists(source_dir):
-    os.makedirs(source_dir)
-    print(f"提示：源目录 {source_dir} 不存在，已自动创建")
-
-# 打开输出文件用于写入
-with open(output_file, "w", encoding="utf-8") as out:
-    # 遍历源目录下的所有文件
-    for file_name in os.listdir(source_dir):
-        # 只处理 HTML 文件
-        if not file_name.endswith(".html"):
-            continue
-
-        # 构造完整的 HTML 文件路径
-        file_path = os.path.join(source_dir, file_name)
-        with open(file_path, "r", encoding="utf-8") as f:
-            html = f.read()
-
-        # 使用 BeautifulSoup 解析 HTML
-        soup = BeautifulSoup(html, "lxml")
-        movie_items = soup.select("ol.grid_view li")  # 获取电影项列表
-
-        # 遍历每部电影的信息
-        for movie in movie_items:
-            try:
-                # 标题（主标题）
-                title_tag = movie.find("span", class_="title")
-                if not title_tag:
-                    print(f"[跳过] 未找到标题：{file_name}")
-                    continue
-                title = title_tag.get_text(strip=True)
-
-                # 评分
-                rating_tag = movie.find("span", class_="rating_num")
-                rating = rating_tag.get_text(strip=True) if rating_tag else ""
-
-                # 评论人数（从星标区域提取）
-                star_div = movie.find("div", class_="star")
-                comment_text = star_div.find_all("span")[-1].get_text(strip=True) if star_div else ""
-                comment_num = ''.join(filter(str.isdigit, comment_text))  # 提取纯数字
-
-                # 导演与主演（从简介段落提取）
-                p_tag = movie.find("div", class_="bd").find("p")
-                info_text = p_tag.get_text(strip=True) if p_tag else ""
-                director, actor = "", ""
-                if "导演" in info_text:
-                    parts = info_text.split("主演:")
-                    director = parts[0].replace("导演:", "").strip()  # 导演信息
-                    if len(parts) > 1:
-                        actor = parts[1].strip()  # 主演信息（可能为空）
-
-                # 年份 / 国家 / 类型（从简介段落的第二行提取）
-                lines = p_tag.get_text().split("\n") if p_tag else []
-                last_line = lines[-1].strip() if len(lines) > 1 else ""
-                detail_parts = last_line.split("/")
-                year = detail_parts[0].strip() if len(detail_parts) > 0 else ""  # 年份
-                country = detail_parts[1].strip() if len(detail_parts) > 1 else ""  # 国家
-                genre = detail_parts[2].strip() if len(detail_parts) > 2 else ""  # 类型
-
-                # 海报图片链接
-                img_tag = movie.find("img")
-                pic_link = img_tag.get("src") if img_tag else ""
-
-                # 写入 TXT 文件（使用制表符 \t 分隔字段，方便后续处理）
-                out.write(f"{title}\t{rating}\t{comment_num}\t{director}\t{actor}\t{year}\t{country}\t{genre}\t{pic_link}\n")
-                print(f"[成功] 写入：{title}")
-
-            except Exception as e:
-                print(f"[跳过] 某部电影解析失败：{e}")
\ No newline at end of file
+source_dir = os.environ.get("DOUBAN_INVENTORY_DIR", r"C:\Users\CK\Desktop\inventory")  # 修改为目标目录
+
+INDEX_FILE = ".parse_index.json"
+
+
+class ParseIndex:
+    """解析索引：文件名 -> {mtime, size, sha256, records}
+
+    提取器版本或解析后端变化时整个索引作废。
+    """
+
+    def __init__(self, path: str, backend: str) -> None:
+        self.path = path
+        self.backend = backend
+        self.files = {}
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("version") == EXTRACTOR_VERSION and data.get("backend") == backend:
+            self.files = data.get("files", {})
+
+    def is_fresh(self, file_path: str, file_name: str) -> bool:
+        """文件自上次解析后未变化时返回 True
+
+        mtime 与大小一致直接视为未变；不一致时再比对内容哈希（例如文件被原样重写）。
+        """
+        entry = self.files.get(file_name)
+        if entry is None:
+            return False
+        stat = os.stat(file_path)
+        if entry["mtime"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+            return True
+        if entry["sha256"] == _file_sha256(file_path):
+            entry["mtime"], entry["size"] = stat.st_mtime_ns, stat.st_size
+            return True
+        return False
+
+    def update(self, file_path: str, file_name: str, records: list) -> None:
+        stat = os.stat(file_path)
+        self.files[file_name] = {
+            "mtime": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "sha256": _file_sha256(file_path),
+            "records": [list(record) for record in records],
+        }
+
+    def records(self, file_name: str) -> list:
+        return [MovieRecord(*fields) for fields in self.files[file_name]["records"]]
+
+    def prune(self, file_names: list) -> None:
+        """删除已不存在的文件对应的索引项"""
+        keep = set(file_names)
+        self.files = {name: entry for name, entry in self.files.items() if name in keep}
+
+    def save(self) -> None:
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": EXTRACTOR_VERSION, "backend": self.backend, "files": self.files},
+                      f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+
+def _file_sha256(file_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def collect_records(source_dir: str, backend: str = "lxml", workers: int = 1,
+                    full: bool = False) -> list:
+    """返回目录下所有电影记录（按页码顺序）
+
+    只重新解析新增或修改过的文件（full=True 时全部重新解析），workers 大于 1 时
+    由多个进程并行解析，其余文件的记录直接取自解析索引。
+    """
+    # 检查源目录是否存在，不存在则创建（避免文件读取错误）
+    if not os.path.exists(source_dir):
+        os.makedirs(source_dir)
+        print(f"提示：源目录 {source_dir} 不存在，已自动创建")
+
+    index = ParseIndex(os.path.join(source_dir, INDEX_FILE), backend)
+    file_names = list_html_files(source_dir)
+    index.prune(file_names)
+    stale = [
+        name for name in file_names
+        if full or not index.is_fresh(os.path.join(source_dir, name), name)
+    ]
+    print(f"📂 共 {len(file_names)} 个 HTML 文件，需要重新解析 {len(stale)} 个")
+
+    # 提取每部电影的信息（与 work3.py 入库使用同一提取器）
+    for file_name, movies in parse_files(source_dir, stale, workers, backend):
+        index.update(os.path.join(source_dir, file_name), file_name, movies)
+        for movie in movies:
+            print(f"[成功] 解析：{movie.title}")
+    index.save()
+    return [movie for file_name in file_names for movie in index.records(file_name)]
+
+
+def write_txt(records: list, output_file: str) -> None:
+    # 打开输出文件用于写入
+    with open(output_file, "w", encoding="utf-8") as out:
+        for movie in records:
+            # 写入 TXT 文件（使用制表符 \t 分隔字段，方便后续处理）
+            out.write(movie.to_txt_line() + "\n")
+
+
+# ========== 列式输出 ==========
+_NAME_SEP_RE = re.compile(r"\s*/\s*")
+
+
+def split_names(text: str) -> list:
+    """拆分 "甲 / 乙 /..." 形式的人名列表，去掉页面截断留下的省略号"""
+    return [name for name in _NAME_SEP_RE.split(text) if name and name != "..."]
+
+
+def to_columns(records: list) -> dict:
+    """把记录转换为列字典；缺失的年份为 None"""
+    return {
+        "title": [r.title for r in records],
+        "rating": [float(r.rating) for r in records],
+        "comment_num": [int(r.comment_num) for r in records],
+        "director": [split_names(r.director) for r in records],
+        "actor": [split_names(r.actor) for r in records],
+        "year": [int(r.year) or None for r in records],
+        "country": [r.country for r in records],
+        "genre": [r.genre.split() for r in records],
+        "pic_link": [r.pic_link for r in records],
+        "douban_id": [int(r.douban_id) or None for r in records],
+    }
+
+
+COLUMNAR_SUFFIXES = {"parquet": ".parquet", "arrow": ".arrow", "csv": ".csv.gz"}
+
+
+def write_columnar(records: list, output_base: str, fmt: str = "auto") -> str:
+    """写出带类型的列式文件，返回文件路径
+
+    Args:
+        records: 电影记录
+        output_base: 不含扩展名的输出路径
+        fmt: "parquet" / "arrow" / "csv"；"auto" 表示有 pyarrow 时用 parquet，否则用 csv
+    """
+    if fmt == "auto":
+        fmt = "parquet" if pa is not None else "csv"
+    if fmt in ("parquet", "arrow") and pa is None:
+        raise RuntimeError(f"输出 {fmt} 需要安装 pyarrow，可改用 --columnar csv")
+    path = output_base + COLUMNAR_SUFFIXES[fmt]
+    columns = to_columns(records)
+
+    if fmt == "csv":
+        with gzip.open(path, "wt", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            for row in zip(*columns.values()):
+                writer.writerow(["|".join(v) if isinstance(v, list) else ("" if v is None else v) for v in row])
+        return path
+
+    schema = pa.schema([
+        ("title", pa.string()),
+        ("rating", pa.float64()),
+        ("comment_num", pa.int64()),
+        ("director", pa.list_(pa.string())),
+        ("actor", pa.list_(pa.string())),
+        ("year", pa.int32()),
+        ("country", pa.string()),
+        ("genre", pa.list_(pa.string())),
+        ("pic_link", pa.string()),
+        ("douban_id", pa.int64()),
+    ])
+    table = pa.Table.from_pydict(columns, schema=schema)
+    if fmt == "parquet":
+        pq.write_table(table, path, compression="zstd")
+    else:
+        # Arrow IPC 文件不压缩，便于下游 memory_map 零拷贝读取
+        with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, schema) as writer:
+            writer.write_table(table)
+    return path
+
+
+def export_txt(source_dir: str, output_file: str, backend: str = "lxml", workers: int = 1,
+               full: bool = False, columnar: str = "") -> int:
+    """解析目录下所有 HTML 文件，写入制表符分隔的 TXT 文件，返回写入条数
+
+    columnar 非空时在 TXT 旁边额外写出同名的列式文件（见 write_columnar）。
+    """
+    records = collect_records(source_dir, backend, workers, full)
+    write_txt(records, output_file)
+    if columnar:
+        path = write_columnar(records, os.path.splitext(output_file)[0], columnar)
+        print(f"📦 列式输出：{path}")
+    return len(records)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="提取豆瓣电影信息到 TXT 文件")
+    parser.add_argument("--source-dir", default=source_dir, help="HTML 文件所在目录")
+    parser.add_argument("--output", default=None, help="输出文件（默认在源目录下）")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="lxml", help="解析后端")
+    parser.add_argument("--workers", type=int, default=1, help="并行解析的进程数")
+    parser.add_argument("--full", action="store_true", help="忽略解析索引，全部重新解析")
+    parser.add_argument("--columnar", choices=["auto", *COLUMNAR_SUFFIXES], default="",
+                        help="额外输出带类型的列式文件")
+    args = parser.parse_args()
+
+    output_file = args.output or os.path.join(args.source_dir, "douban_extracted.txt")  # 输出文件仍放在该目录下
+    total = export_txt(args.source_dir, output_file, args.backend, args.workers, args.full, args.columnar)
+    print(f"\n✅ 共写入 {total} 部电影信息：{output_file}")
@@ -1,120 +1,222 @@
+import argparse
+import operator
 import os
-import pymysql
-from bs4 import BeautifulSoup
+import sys
+import time
+from functools import reduce
+
 from peewee import *
+from peewee import Expression
+
+from db_config import bump_generation, db
+from douban_extractor import BACKENDS, parse_directory
+from movie_models import DoubanMovie, prepare_movie_table
+from movie_stats import MovieStat, rebuild_stats
+
+
+# ========== 查询计划 ==========
+def explain(query):
+    """返回查询计划的文本行
+
+    SQLite 为 EXPLAIN QUERY PLAN 的 detail 列，MySQL 为 EXPLAIN 每行的 table / type / key，
+    其余数据库原样返回 EXPLAIN 的输出。
+    """
+    database = query.model._meta.database
+    sql, params = query.sql()
+    if isinstance(database, SqliteDatabase):
+        return [row[-1] for row in database.execute_sql("EXPLAIN QUERY PLAN " + sql, params).fetchall()]
+    cursor = database.execute_sql("EXPLAIN " + sql, params)
+    names = [column[0] for column in cursor.description]
+    rows = [dict(zip(names, row)) for row in cursor.fetchall()]
+    if isinstance(database, MySQLDatabase):
+        return [f"table={row['table']} type={row['type']} key={row['key']}" for row in rows]
+    return [" ".join(str(value) for value in row.values()) for row in rows]
+
+
+def check_year_index(model, year=1994):
+    """EXPLAIN 按年份查询的语句，确认走了 year 索引；返回 (是否使用索引, 查询计划)"""
+    database = model._meta.database
+    names = [index.name for index in database.get_indexes(model._meta.table_name) if index.columns == ["year"]]
+    plan = explain(model.select().where(model.year == year))
+    if not names:
+        return False, plan
+    index_name = names[0]
+    if isinstance(database, SqliteDatabase):
+        used = any(f"INDEX {index_name}" in line for line in plan)
+    elif isinstance(database, MySQLDatabase):
+        used = any(line.endswith(f"key={index_name}") for line in plan)
+    else:
+        used = any(index_name in line for line in plan)
+    return used, plan
+
+
+def backfill_natural_keys(model, records):
+    """按 (片名, 年份) 为缺少 douban_id 的旧行回填自然键，保留原有 id（收藏等外键仍然有效）
+
+    返回回填的行数；匹配不上的旧行保持原样。
+    """
+    orphans = list(model.select(model.id, model.title, model.year).where(model.douban_id.is_null()))
+    if not orphans:
+        return 0
+    by_key = {(r.title, r.year): r.douban_id for r in records if r.douban_id}
+    used = {row.douban_id for row in model.select(model.douban_id).where(model.douban_id.is_null(False))}
+    filled = 0
+    with model._meta.database.atomic():
+        for row in orphans:
+            douban_id = by_key.get((row.title, row.year))
+            if douban_id and douban_id not in used:
+                model.update(douban_id=douban_id).where(model.id == row.id).execute()
+                used.add(douban_id)
+                filled += 1
+    print(f"🔑 为 {filled} 条旧记录回填 douban_id，{len(orphans) - filled} 条未能匹配")
+    return filled
+
+
+def upsert_query(model, rows):
+    """按 douban_id 插入或更新的 insert_many 语句，只改动内容有变化的行
+
+    MySQL 使用 ON DUPLICATE KEY UPDATE（值相同的行本身不计入改动）；
+    SQLite / PostgreSQL 使用 ON CONFLICT ... DO UPDATE，并用 WHERE 跳过未变化的行。
+    """
+    key = model._meta.fields["douban_id"]
+    preserve = [f for f in model._meta.sorted_fields if f is not key and f is not model._meta.primary_key]
+    query = model.insert_many(rows)
+    database = model._meta.database
+    if isinstance(database, MySQLDatabase):
+        return query.on_conflict(preserve=preserve)
+    op = "IS DISTINCT FROM" if isinstance(database, PostgresqlDatabase) else "IS NOT"
+    changed = reduce(operator.or_, [Expression(f, op, getattr(EXCLUDED, f.column_name)) for f in preserve])
+    return query.on_conflict(conflict_target=[key], preserve=preserve, where=changed)
+
+
+# ========== 批量写入 ==========
+def validate_row(model, row):
+    """按模型字段定义检查一行数据，返回错误描述；没有问题时返回 None"""
+    for field in model._meta.sorted_fields:
+        if field.name not in row:
+            continue
+        value = row[field.name]
+        if value is None and not field.null:
+            return f"{field.name} 不能为空"
+        max_length = getattr(field, "max_length", None)
+        if max_length and isinstance(value, str) and len(value) > max_length:
+            return f"{field.name} 长度 {len(value)} 超过 {max_length}"
+    return None
+
+
+class BulkLoader:
+    """缓冲待写入的行，满 batch_size 条后在一个事务中用 insert_many 一次写入
+
+    upsert=True 时按自然键插入或更新（见 upsert_query），重复导入不会产生重复行。
+    整批写入失败时回退为逐条写入（每条在各自的保存点中），记录并跳过坏行。
+    """
+
+    def __init__(self, model, batch_size=500, upsert=False):
+        self.model = model
+        self.batch_size = batch_size
+        self.upsert = upsert
+        self.count = 0
+        self.affected = 0  # 数据库报告的受影响行数（upsert 时不含内容未变的行）
+        self.skipped = 0
+        self._buffer = []
+
+    def _query(self, rows):
+        query = upsert_query(self.model, rows) if self.upsert else self.model.insert_many(rows)
+        return query.as_rowcount()
+
+    def add(self, row, label):
+        """加入一行；label 用于出错时定位（如 "文件名 第N条"）"""
+        error = validate_row(self.model, row)
+        if error:
+            print(f"[跳过] {label} 写入失败：{error}")
+            self.skipped += 1
+            return
+        self._buffer.append((label, row))
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._buffer:
+            return
+        batch, self._buffer = self._buffer, []
+        database = self.model._meta.database
+        try:
+            with database.atomic():
+                self.affected += self._query([row for _, row in batch]).execute()
+            self.count += len(batch)
+            print(f"[成功] 批量写入 {len(batch)} 条，累计 {self.count} 条")
+            return
+        except DatabaseError as e:
+            print(f"[警告] 批量写入失败（{e}），改为逐条写入以定位坏行")
+
+        for label, row in batch:
+            try:
+                with database.atomic():
+                    self.affected += self._query([row]).execute()
+                self.count += 1
+            except DatabaseError as e:
+                print(f"[跳过] {label} 写入失败：{e}")
+                self.skipped += 1
 
-# ========== 数据库连接 ==========
-pymysql.install_as_MySQLdb()
-db = MySQLDatabase(
-    database="python_lesson",
-    host="localhost",
-    port=3306,
-    user="root",
-    password="Cqh051213",  # 改为你自己的数据库密码
-    charset='utf8mb4'
-)
-
-# ========== 数据模型 ==========
-class DoubanMovie(Model):
-    title = CharField(max_length=100)
-    rating = FloatField()
-    comment_num = IntegerField()
-    director = TextField()
-    actor = CharField(max_length=100)
-    year = IntegerField()
-    country = CharField(max_length=50)
-    genre = CharField(max_length=100, null=True)
-    pic_link = TextField(null=True)
-
-    class Meta:
-        database = db
-        table_name = 'douban_movie'
 
 # ========== 提取并写入数据库 ==========
-def extract_and_store_html_to_db(source_dir):
-    count = 0
-    for file_name in os.listdir(source_dir):
-        if not file_name.endswith(".html"):
-            continue  # 跳过非 HTML 文件
-
-        file_path = os.path.join(source_dir, file_name)
-        with open(file_path, "r", encoding="utf-8") as f:
-            html = f.read()
-
-        soup = BeautifulSoup(html, "lxml")
-        movie_items = soup.select("ol.grid_view li")  # 获取电影项列表
-
-        for idx, movie in enumerate(movie_items, 1):
-            try:
-                # 标题
-                title_tag = movie.find("span", class_="title")
-                title = title_tag.get_text(strip=True) if title_tag else "无标题"
-
-                # 评分
-                rating_tag = movie.find("span", class_="rating_num")
-                rating = float(rating_tag.get_text(strip=True)) if rating_tag else 0.0
-
-                # 评论人数
-                star_div = movie.find("div", class_="star")
-                comment_text = star_div.find_all("span")[-1].get_text(strip=True) if star_div else ""
-                comment_num = int(''.join(filter(str.isdigit, comment_text))) if comment_text else 0
-
-                # 导演与主演
-                p_tag = movie.find("div", class_="bd").find("p")
-                info_text = p_tag.get_text(strip=True) if p_tag else ""
-                director, actor = "", ""
-                if "导演" in info_text:
-                    parts = info_text.split("主演:")
-                    director = parts[0].replace("导演:", "").strip()
-                    actor = parts[1].strip() if len(parts) > 1 else ""
-
-                # 年份 / 国家 / 类型（新版解析方式，兼容多种换行结构）
-                year = 0
-                country = ""
-                genre = ""
-                detail_line = ""
-                if p_tag:
-                    for line in p_tag.stripped_strings:
-                        if '/' in line and any(c.isdigit() for c in line):
-                            detail_line = line
-                            break
-                parts = [p.strip() for p in detail_line.split('/')]
-                if len(parts) > 0 and parts[0][:4].isdigit():
-                    year = int(parts[0][:4])
-                country = parts[1] if len(parts) > 1 else ""
-                genre = parts[2] if len(parts) > 2 else ""
-
-                # 图片链接
-                pic_tag = movie.find("img")
-                pic_link = pic_tag.get("src") if pic_tag else ""
-
-                # 写入数据库
-                DoubanMovie.create(
-                    title=title,
-                    rating=rating,
-                    comment_num=comment_num,
-                    director=director,
-                    actor=actor,
-                    year=year,
-                    country=country,
-                    genre=genre,
-                    pic_link=pic_link
-                )
-                print(f"[成功] 第{count + 1}部：{title}")
-                count += 1
-
-            except Exception as e:
-                print(f"[跳过] {file_name} 第{idx}条写入失败：{e}")
-
-    print(f"\n✅ 共写入 {count} 部电影信息")
+def extract_and_store_html_to_db(source_dir, backend="lxml", workers=1, batch_size=500, upsert=True):
+    began = time.perf_counter()
+    loader = BulkLoader(DoubanMovie, batch_size, upsert)
+    # 与 work2.py 共用同一提取器，字段已转换为对应类型；workers > 1 时多进程并行解析
+    pages = parse_directory(source_dir, workers, backend)
+    if upsert and DoubanMovie.select().where(DoubanMovie.douban_id.is_null()).exists():
+        # 旧表里有缺少自然键的行：先完整解析一遍，用来回填
+        pages = list(pages)
+        backfill_natural_keys(DoubanMovie, [movie for _, movies in pages for movie in movies])
+    for file_name, movies in pages:
+        for idx, movie in enumerate(movies, 1):
+            row = movie._asdict()
+            row["douban_id"] = movie.douban_id or None  # 识别不出条目 id 的记录没有自然键，跳过
+            loader.add(row, f"{file_name} 第{idx}条")
+    loader.flush()
+
+    elapsed = time.perf_counter() - began
+    stats_existed = MovieStat.table_exists()
+    groups = rebuild_stats(DoubanMovie)  # 重算汇总表，供统计接口直接读取
+    print(f"📊 已重建统计汇总：{groups} 个分组")
+    if loader.affected or not upsert or not stats_existed:
+        bump_generation(DoubanMovie._meta.table_name)  # 通知 Web 应用的查询缓存失效
+    print(f"\n✅ 共处理 {loader.count} 部电影信息（受影响 {loader.affected} 行），跳过 {loader.skipped} 条，"
+          f"用时 {elapsed:.2f}s（{loader.count / elapsed if elapsed else 0:.0f} 行/秒）")
+    return loader.count
 
 # ========== 主程序入口 ==========
 if __name__ == "__main__":
-    db.connect()
-    db.drop_tables([DoubanMovie])                # 重新创建表（谨慎使用，会清空数据）
-    db.create_tables([DoubanMovie])
-    db.execute_sql("ALTER TABLE douban_movie AUTO_INCREMENT = 1;")  # id 从1开始
+    parser = argparse.ArgumentParser(description="解析 HTML 并写入数据库")
+    parser.add_argument("--source-dir", default=os.environ.get("DOUBAN_INVENTORY_DIR", r"C:\Users\CK\Desktop\inventory"),
+                        help="HTML 文件所在目录")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="lxml", help="解析后端")
+    parser.add_argument("--workers", type=int, default=1, help="并行解析的进程数")
+    parser.add_argument("--batch-size", type=int, default=500, help="每批写入的行数")
+    parser.add_argument("--mode", choices=["upsert", "replace"], default="upsert",
+                        help="upsert：按豆瓣条目 id 增量插入/更新（默认，id 保持不变）；"
+                             "replace：清空重建表（会使收藏等外键失效）")
+    parser.add_argument("--check-indexes", action="store_true",
+                        help="只迁移表结构（不论 --mode，不会清空表）并 EXPLAIN 按年份查询，"
+                             "未使用 year 索引时以非零状态退出；自动化检查见 tests/test_work3.py")
+    args = parser.parse_args()
 
-    # 修改为目标路径（使用原始字符串避免反斜杠转义）
-    html_source_dir = r"C:\Users\CK\Desktop\inventory"
-    extract_and_store_html_to_db(html_source_dir)
\ No newline at end of file
+    db.connect()
+    if args.mode == "replace" and not args.check_indexes:
+        db.drop_tables([DoubanMovie])                # 重新创建表（谨慎使用，会清空数据）
+        db.create_tables([DoubanMovie])
+        if isinstance(db, MySQLDatabase):
+            db.execute_sql("ALTER TABLE douban_movie AUTO_INCREMENT = 1;")  # id 从1开始
+    else:
+        prepare_movie_table()
+
+    if args.check_indexes:
+        used, plan = check_year_index(DoubanMovie)
+        for line in plan:
+            print(f"   {line}")
+        print("✅ 按年份查询使用了 year 索引" if used else "❌ 按年份查询没有使用 year 索引")
+        sys.exit(0 if used else 1)
+
+    extract_and_store_html_to_db(args.source_dir, args.backend, args.workers, args.batch_size,
+                                 upsert=args.mode == "upsert")
\ No newline at end of file
@@ -1,38 +1,192 @@
 """
 Flask + Flasgger 实验系统：
-提供根据年份查询豆瓣电影标题的接口，并生成 Swagger API 文档。
+提供按年份、评分、国家、类型、导演等条件查询豆瓣电影的接口，并生成 Swagger API 文档。
+
+/search_api 支持排序、字段投影和游标（keyset）分页：每页最多 limit 条，
+响应中的 next_cursor 原样传回即可取下一页，翻页代价与页码无关。
+
+查询结果缓存在进程内（LRU + TTL），缓存键带有数据代号，work3.py 重新入库后自动失效；
+响应带 ETag 与 Cache-Control，客户端带 If-None-Match 重复请求时直接返回 304。
+
+/fulltext_api 在片名 / 导演 / 主演中做子串检索，由进程内的 bigram 倒排索引回答（见 movie_index.py），
+不执行 LIKE '%...%' 全表扫描；数据重新导入后索引在下一次查询时重建。
+
+/stats_api 返回按年份、年代、国家、类型汇总的统计，数据来自入库时重建的 movie_stats 表
+（见 movie_stats.py），按数据代号整体缓存在内存中。
 """
 
+import base64
+import hashlib
+import json
+import math
+import os
+
 from flask import Flask, request, jsonify
 from flasgger import Swagger
-from peewee import MySQLDatabase, Model, CharField, IntegerField
 
 # ========= 数据库连接配置 =========
-db = MySQLDatabase(
-    database='python_lesson',
-    host='localhost',
-    port=3306,
-    user='root',
-    password='Cqh051213',  # 改为你自己的数据库密码
-    charset='utf8mb4'
+# 后端由 DATABASE_URL 决定（默认本地 MySQL），见 db_config.py
+from db_config import MAX_INTEGER, GenerationWatcher, init_app
+from movie_index import LiveIndex
+from movie_models import DoubanMovie  # 表由 work3.py 建表 / 迁移，与入库共用同一模型
+from movie_stats import KINDS, LiveStats
+from result_cache import TTLCache
+
+
+# ========= 初始化应用 =========
+app = Flask(__name__)
+swagger = Swagger(app)
+init_app(app)  # 每个请求从连接池取连接，结束时归还
+
+# ========= 查询缓存 =========
+CACHE_TTL = 300      # 进程内缓存条目的存活秒数
+CACHE_MAX_AGE = 60   # 允许客户端 / 代理缓存响应的秒数
+search_cache = TTLCache(maxsize=512, ttl=CACHE_TTL)
+generation = GenerationWatcher(DoubanMovie._meta.table_name)
+
+# ========= 全文索引 =========
+INDEX_FIELDS = ('id', 'title', 'director', 'actor', 'year', 'rating')
+movie_index = LiveIndex(
+    lambda: DoubanMovie.select(*[getattr(DoubanMovie, name) for name in INDEX_FIELDS]).dicts(),
+    generation,
 )
 
+# ========= 统计汇总 =========
+movie_stats = LiveStats(generation)
 
-# ========= 数据模型 =========
-# pylint: disable=too-few-public-methods
-class DoubanMovie(Model):
-    """豆瓣电影模型（仅标题和年份）"""
-    title = CharField()
-    year = IntegerField()
+# ========= 查询参数 =========
+FIELDS = ('id', 'douban_id', 'title', 'rating', 'comment_num', 'director',
+          'actor', 'year', 'country', 'genre', 'pic_link')
+DEFAULT_FIELDS = ('id', 'title', 'year', 'rating')
+SORT_FIELDS = ('id', 'rating', 'year', 'title', 'comment_num')
+# 游标中排序字段的值允许的 JSON 类型（评分如 9.0 会被编码成浮点数，也接受整数）
+CURSOR_VALUE_TYPES = {'id': (int,), 'rating': (int, float), 'year': (int,),
+                      'title': (str,), 'comment_num': (int,)}
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
 
-    class Meta:
-        database = db
-        table_name = 'douban_movie'
 
+def _int_arg(args, name):
+    value = args.get(name, '').strip()
+    if not value:
+        return None
+    if not value.isdecimal() or int(value) > MAX_INTEGER:  # isdigit 接受 "²" 等 int() 无法解析的字符
+        raise ValueError(f"参数 {name} 必须是非负整数")
+    return int(value)
+
+
+def _float_arg(args, name):
+    value = args.get(name, '').strip()
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        raise ValueError(f"参数 {name} 必须是数字") from None
+
+
+def encode_cursor(sort, value, movie_id):
+    raw = json.dumps([sort, value, movie_id], ensure_ascii=False).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def _is_a(value, types):
+    # bool 是 int 的子类，JSON 的 true / false 不能当作数值；整数还须在数据库能表示的范围内
+    if not isinstance(value, types) or isinstance(value, bool):
+        return False
+    if isinstance(value, int):
+        return -MAX_INTEGER <= value <= MAX_INTEGER
+    return not isinstance(value, float) or math.isfinite(value)
+
+
+def decode_cursor(cursor, sort):
+    """解析游标，返回 (排序字段的值, id)；游标损坏或与当前排序不一致时抛出 ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        cursor_sort, value, movie_id = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError("cursor 无效") from None
+    if cursor_sort != sort:
+        raise ValueError("cursor 与当前 sort 不匹配")
+    if not _is_a(movie_id, (int,)) or not _is_a(value, CURSOR_VALUE_TYPES[sort.lstrip('-')]):
+        raise ValueError("cursor 无效")
+    return value, movie_id
 
-# ========= 初始化应用 =========
-app = Flask(__name__)
-swagger = Swagger(app)
+
+def parse_search_args(args):
+    """校验查询参数并规范化为字典（也用作缓存键）；参数不合法时抛出 ValueError"""
+    params = {name: _int_arg(args, name) for name in ('year', 'year_from', 'year_to')}
+    params['min_rating'] = _float_arg(args, 'min_rating')
+    for name in ('country', 'genre', 'director'):
+        params[name] = args.get(name, '').strip() or None
+
+    sort = args.get('sort', '').strip() or 'id'
+    if sort.lstrip('-') not in SORT_FIELDS:
+        raise ValueError(f"sort 只能是 {'、'.join(SORT_FIELDS)}（前加 - 表示降序）")
+    params['sort'] = sort
+
+    fields = tuple(f.strip() for f in args.get('fields', '').split(',') if f.strip()) or DEFAULT_FIELDS
+    unknown = [f for f in fields if f not in FIELDS]
+    if unknown:
+        raise ValueError(f"未知字段：{'、'.join(unknown)}")
+    params['fields'] = fields
+
+    limit = _int_arg(args, 'limit')
+    params['limit'] = DEFAULT_LIMIT if limit is None else min(max(limit, 1), MAX_LIMIT)
+
+    cursor = args.get('cursor', '').strip() or None
+    params['cursor'] = decode_cursor(cursor, sort) if cursor else None
+    return params
+
+
+def search_movies(params):
+    """按规范化后的参数查询一页电影，返回 (电影字典列表, 下一页游标或 None)"""
+    sort = params['sort']
+    sort_name = sort.lstrip('-')
+    descending = sort.startswith('-')
+    sort_field = getattr(DoubanMovie, sort_name)
+
+    # 投影之外始终取 id 与排序字段，用于生成下一页游标
+    columns = set(params['fields']) | {'id', sort_name}
+    query = DoubanMovie.select(*[getattr(DoubanMovie, name) for name in FIELDS if name in columns])
+
+    conditions = []
+    if params['year'] is not None:
+        conditions.append(DoubanMovie.year == params['year'])
+    if params['year_from'] is not None:
+        conditions.append(DoubanMovie.year >= params['year_from'])
+    if params['year_to'] is not None:
+        conditions.append(DoubanMovie.year <= params['year_to'])
+    if params['min_rating'] is not None:
+        conditions.append(DoubanMovie.rating >= params['min_rating'])
+    for name in ('country', 'genre', 'director'):
+        if params[name]:
+            conditions.append(getattr(DoubanMovie, name).contains(params[name]))
+
+    # keyset 分页：从上一页最后一条 (排序值, id) 之后继续，id 保证顺序唯一
+    if params['cursor'] is not None:
+        value, last_id = params['cursor']
+        if sort_name == 'id':
+            conditions.append(DoubanMovie.id < last_id if descending else DoubanMovie.id > last_id)
+        elif descending:
+            conditions.append((sort_field < value) | ((sort_field == value) & (DoubanMovie.id < last_id)))
+        else:
+            conditions.append((sort_field > value) | ((sort_field == value) & (DoubanMovie.id > last_id)))
+    if conditions:
+        query = query.where(*conditions)
+
+    order = [sort_field] if sort_name == 'id' else [sort_field, DoubanMovie.id]
+    query = query.order_by(*[f.desc() if descending else f.asc() for f in order])
+
+    # 多取一条判断是否还有下一页
+    rows = list(query.limit(params['limit'] + 1).dicts())
+    next_cursor = None
+    if len(rows) > params['limit']:
+        rows = rows[:params['limit']]
+        last = rows[-1]
+        next_cursor = encode_cursor(sort, last[sort_name], last['id'])
+    movies = [{name: row[name] for name in params['fields']} for row in rows]
+    return movies, next_cursor
 
 
 # ========= 首页路由 =========
@@ -46,42 +200,273 @@ def index():
 @app.route('/search_api', methods=['GET'])
 def search_api():
     """
-    查询某一年上映的电影
+    按条件查询电影（分页）
+    所有过滤条件均可省略，多个条件同时生效（AND）。
     ---
     parameters:
       - name: year
         in: query
         type: integer
+        required: false
+        description: 上映年份（精确匹配）
+      - name: year_from
+        in: query
+        type: integer
+        required: false
+        description: 上映年份下限（含）
+      - name: year_to
+        in: query
+        type: integer
+        required: false
+        description: 上映年份上限（含）
+      - name: min_rating
+        in: query
+        type: number
+        required: false
+        description: 最低评分（含）
+      - name: country
+        in: query
+        type: string
+        required: false
+        description: 国家 / 地区，子串匹配，如 美国
+      - name: genre
+        in: query
+        type: string
+        required: false
+        description: 类型，子串匹配，如 剧情
+      - name: director
+        in: query
+        type: string
+        required: false
+        description: 导演姓名子串
+      - name: sort
+        in: query
+        type: string
+        required: false
+        default: id
+        enum: [id, -id, rating, -rating, year, -year, title, -title, comment_num, -comment_num]
+        description: 排序字段，前加 - 表示降序；id 即入库顺序
+      - name: fields
+        in: query
+        type: string
+        required: false
+        default: id,title,year,rating
+        description: >
+          返回的字段，逗号分隔，可选 id, douban_id, title, rating, comment_num,
+          director, actor, year, country, genre, pic_link
+      - name: limit
+        in: query
+        type: integer
+        required: false
+        default: 20
+        description: 每页条数（1-100）
+      - name: cursor
+        in: query
+        type: string
+        required: false
+        description: 上一页响应中的 next_cursor，需与 sort 保持一致
+    responses:
+      200:
+        description: 一页电影；next_cursor 为空表示已是最后一页
+        schema:
+          type: object
+          properties:
+            movies:
+              type: array
+              items:
+                type: object
+                description: 只包含 fields 指定的字段
+            count:
+              type: integer
+              description: 本页条数
+            next_cursor:
+              type: string
+              description: 下一页游标，没有更多结果时为 null
+        headers:
+          ETag:
+            type: string
+            description: 数据代号 + 查询参数，数据未重新导入时不变
+      304:
+        description: 请求头 If-None-Match 与当前 ETag 一致，结果未变化
+      400:
+        description: 参数不合法
+        schema:
+          type: object
+          properties:
+            error:
+              type: string
+    """
+    try:
+        params = parse_search_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    gen = generation.current()
+    key = (gen, tuple(sorted(params.items())))
+    etag = f"{gen}-{hashlib.sha1(repr(key[1]).encode('utf-8')).hexdigest()[:16]}"
+    if etag in request.if_none_match:
+        response = app.response_class(status=304)
+    else:
+        page = search_cache.get(key)
+        if page is None:
+            page = search_movies(params)
+            search_cache.set(key, page)
+        movies, next_cursor = page
+        response = jsonify({
+            "movies": movies,
+            "count": len(movies),
+            "next_cursor": next_cursor,
+        })
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = CACHE_MAX_AGE
+    return response
+
+
+# ========= 全文检索接口 =========
+@app.route('/fulltext_api', methods=['GET'])
+def fulltext_api():
+    """
+    按片名 / 导演 / 主演检索电影
+    子串匹配（不区分大小写），片名命中排在导演、主演之前，前缀或完全一致的命中加分。
+    ---
+    parameters:
+      - name: q
+        in: query
+        type: string
         required: true
-        description: 上映年份
+        description: 检索词，如 宫崎骏、肖申克
+      - name: limit
+        in: query
+        type: integer
+        required: false
+        default: 20
+        description: 最多返回条数（1-100）
     responses:
       200:
-        description: 返回该年份的电影标题列表
+        description: 按相关度排序的电影
         schema:
           type: object
           properties:
-            year:
+            q:
+              type: string
+            total:
               type: integer
+              description: 命中总数
             movies:
               type: array
               items:
-                type: string
+                type: object
+                properties:
+                  id:
+                    type: integer
+                  title:
+                    type: string
+                  director:
+                    type: string
+                  actor:
+                    type: string
+                  year:
+                    type: integer
+                  rating:
+                    type: number
+                  score:
+                    type: integer
+      400:
+        description: 缺少检索词或参数不合法
     """
-    year_param = request.args.get('year', '').strip()
-    if not year_param.isdigit():
-        return jsonify({"error": "请输入合法的年份参数"}), 400
-
-    year = int(year_param)
-    query_result = DoubanMovie.select().where(DoubanMovie.year == year)
-    titles = [movie.title for movie in query_result]
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({"error": "请输入检索词"}), 400
+    try:
+        limit = _int_arg(request.args, 'limit')
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    limit = DEFAULT_LIMIT if limit is None else min(max(limit, 1), MAX_LIMIT)
 
+    total, results = movie_index.search(query, limit)
     return jsonify({
-        "year": year,
-        "movies": titles
+        "q": query,
+        "total": total,
+        "movies": [dict(movie, score=score) for movie, score in results],
     })
 
 
+# ========= 统计接口 =========
+@app.route('/stats_api', methods=['GET'])
+def stats_api():
+    """
+    电影目录统计
+    每个分组给出电影数、平均评分和评价人数合计；国家、类型为多值字段，一部电影计入其所属的每个分组。
+    ---
+    parameters:
+      - name: kind
+        in: query
+        type: string
+        required: false
+        enum: [year, decade, country, genre]
+        description: 分组维度；省略时返回全部维度
+      - name: limit
+        in: query
+        type: integer
+        required: false
+        description: 每个维度最多返回的分组数；year / decade 按键升序，country / genre 按电影数降序
+    responses:
+      200:
+        description: 维度 -> 分组列表
+        schema:
+          type: object
+          additionalProperties:
+            type: array
+            items:
+              type: object
+              properties:
+                key:
+                  type: string
+                movie_count:
+                  type: integer
+                avg_rating:
+                  type: number
+                comment_total:
+                  type: integer
+      304:
+        description: 请求头 If-None-Match 与当前 ETag 一致，统计未变化
+      400:
+        description: 参数不合法
+    """
+    kind = request.args.get('kind', '').strip()
+    if kind and kind not in KINDS:
+        return jsonify({"error": f"kind 只能是 {'、'.join(KINDS)}"}), 400
+    try:
+        limit = _int_arg(request.args, 'limit')
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    gen, stats = movie_stats.get()
+    etag = f"stats-{gen}-{kind}-{limit}"
+    if etag in request.if_none_match:
+        response = app.response_class(status=304)
+    else:
+        kinds = [kind] if kind else KINDS
+        response = jsonify({name: stats[name][:limit] for name in kinds})
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = CACHE_MAX_AGE
+    return response
+
+
+def create_app(config=None):
+    """生产环境入口（gunicorn "work5:create_app()" 或 python serve.py work5）：关闭调试模式
+
+    并不是真正的应用工厂：路由注册在模块级的 app 上，这里修改并返回的就是这个单例，
+    每次调用改动的是同一份配置。每个进程只调用一次。
+    """
+    app.config['DEBUG'] = False
+    app.config.update(config or {})
+    return app
+
+
 # ========= 运行主程序 =========
 if __name__ == '__main__':
-    db.connect()
-    app.run(debug=True)
\ No newline at end of file
+    # 开发服务器：单进程，调试模式默认关闭，设置 FLASK_DEBUG=1 时打开
+    app.run(debug=os.environ.get('FLASK_DEBUG') == '1')
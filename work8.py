@@ -1,26 +1,30 @@
 # main.py：添加安全初始化，不会破坏现有数据
+import json
+import logging
+import os
+import threading
+import time
+
 from flask import Flask, render_template, request, redirect, url_for, jsonify
 from flask_login import LoginManager, login_user, login_required, logout_user, UserMixin, current_user
-from peewee import Model, CharField, IntegerField, ForeignKeyField, MySQLDatabase
-from werkzeug.security import generate_password_hash, check_password_hash
-import pymysql
-pymysql.install_as_MySQLdb()
+from peewee import Model, CharField, ForeignKeyField
+from db_config import MAX_INTEGER, GenerationWatcher, db, init_app, migrate_indexes  # 后端由 DATABASE_URL 决定（默认本地 MySQL 连接池）
+from movie_index import LiveIndex
+from movie_models import DoubanMovie, prepare_movie_table  # 电影表与 work3.py 入库共用同一模型
+from password_hashing import HashBusy, hasher_from_env
+from result_cache import TTLCache
 
 app = Flask(__name__, template_folder='work8')
-app.secret_key = 'super-secret-key'
-
-db =MySQLDatabase(
-    database='python_lesson',
-    user='root',
-    password='Cqh051213',
-    host='localhost',
-    port=3306,
-    charset='utf8mb4'
-)
+DEV_SECRET_KEY = 'super-secret-key'  # 仅供本地开发，仓库中公开，生产环境须用 SECRET_KEY 覆盖
+app.secret_key = DEV_SECRET_KEY
+init_app(app)  # 每个请求从连接池取连接，结束时归还
 
 login_manager = LoginManager(app)
 login_manager.login_view = 'login'
 
+# 密码哈希参数与是否放进有界线程池 / 进程池由 PASSWORD_HASH_* 环境变量决定，见 password_hashing.py
+password_hasher = hasher_from_env()
+
 class BaseModel(Model):
     class Meta:
         database = db
@@ -29,20 +33,127 @@ class User(UserMixin, BaseModel):
     username = CharField(unique=True)
     password_hash = CharField()
 
-class DoubanMovie(BaseModel):
-    title = CharField()
-    year = IntegerField()
-
-    class Meta:
-        table_name = 'douban_movie'  # ✅ 显式指定使用已有的表名
-
 class Collection(BaseModel):
     user = ForeignKeyField(User, backref='collections')
     movie = ForeignKeyField(DoubanMovie)
 
-@login_manager.user_loader 
+    class Meta:
+        indexes = ((('user', 'movie'), True),)  # 同一用户不能重复收藏同一部电影
+
+
+def dedupe_collections():
+    """删除重复的 (用户, 电影) 收藏（保留最早的一条），返回删除条数；为旧表补唯一索引前调用"""
+    seen = set()
+    duplicates = []
+    for row in Collection.select(Collection.id, Collection.user, Collection.movie).order_by(Collection.id).tuples():
+        key = row[1:]
+        if key in seen:
+            duplicates.append(row[0])
+        seen.add(key)
+    for start in range(0, len(duplicates), 500):
+        Collection.delete().where(Collection.id.in_(duplicates[start:start + 500])).execute()
+    return len(duplicates)
+
+
+def collect_movies(user_id, movie_ids):
+    """批量收藏，返回新增条数；不存在的电影 id 被忽略，已收藏的由唯一索引忽略（INSERT ... ON CONFLICT DO NOTHING）"""
+    existing = [row.id for row in DoubanMovie.select(DoubanMovie.id).where(DoubanMovie.id.in_(movie_ids))]
+    if not existing:
+        return 0
+    rows = [{'user': user_id, 'movie': movie_id} for movie_id in existing]
+    return Collection.insert_many(rows).on_conflict_ignore().as_rowcount().execute()
+
+
+def uncollect_movies(user_id, movie_ids):
+    """批量取消收藏，返回删除条数"""
+    return (Collection
+            .delete()
+            .where((Collection.user == user_id) & Collection.movie.in_(movie_ids))
+            .execute())
+
+# ========== 查询服务 ==========
+# 设置环境变量 WORK8_SEARCH_LOG=1 后输出结构化查询日志（每行一个 JSON），默认不输出
+search_logger = logging.getLogger('work8.search')
+if os.environ.get('WORK8_SEARCH_LOG'):
+    search_logger.addHandler(logging.StreamHandler())
+    search_logger.setLevel(logging.INFO)
+
+
+def log_event(event, **fields):
+    if search_logger.isEnabledFor(logging.INFO):
+        search_logger.info(json.dumps({'event': event, **fields}, ensure_ascii=False))
+
+
+# 数据代号：work3.py 每次入库后加一，年份列表与关键词索引都按它失效（见 db_config.py）
+generation = GenerationWatcher(DoubanMovie._meta.table_name)
+_years_cache = {'years': None, 'generation': None}
+_years_lock = threading.Lock()
+
+
+def distinct_years():
+    """库中出现过的年份（升序），SELECT DISTINCT year 的结果按数据代号缓存，重新入库后重新查询"""
+    current = generation.current()
+    with _years_lock:
+        if _years_cache['years'] is not None and _years_cache['generation'] == current:
+            return _years_cache['years']
+    query = DoubanMovie.select(DoubanMovie.year).distinct().order_by(DoubanMovie.year)
+    years = [row.year for row in query]
+    with _years_lock:
+        _years_cache.update(years=years, generation=current)
+    log_event('distinct_years', count=len(years))
+    return years
+
+
+# 片名 / 导演 / 主演的关键词检索走进程内 bigram 索引，数据重新导入后自动重建（见 movie_index.py）
+movie_index = LiveIndex(
+    lambda: DoubanMovie.select(DoubanMovie.id, DoubanMovie.title, DoubanMovie.year, DoubanMovie.rating,
+                               DoubanMovie.director, DoubanMovie.actor).dicts(),
+    generation,
+)
+
+
+def search_movies_by_keyword(keyword, limit=50):
+    """在片名 / 导演 / 主演中检索关键词，返回按相关度排序的电影字典列表"""
+    began = time.perf_counter()
+    total, results = movie_index.search(keyword, limit)
+    movies = [movie for movie, _ in results]
+    log_event('keyword_search', q=keyword, total=total, count=len(movies),
+              ms=round((time.perf_counter() - began) * 1000, 3))
+    return movies
+
+
+def search_movies_by_year(year):
+    """按年份查询电影：只执行一次（走 year 索引的）查询，返回物化后的列表"""
+    began = time.perf_counter()
+    query = (DoubanMovie
+             .select(DoubanMovie.id, DoubanMovie.title, DoubanMovie.year)
+             .where(DoubanMovie.year == year)
+             .order_by(DoubanMovie.id))
+    movies = list(query)
+    log_event('search', year=year, count=len(movies), ms=round((time.perf_counter() - began) * 1000, 2))
+    return movies
+
+
+# ========== 用户缓存 ==========
+# 已登录请求都要经过 load_user：缓存 User 对象，命中时不查数据库。
+# 登出（以及今后修改密码、删除用户）时调用 invalidate_user；其他进程里的副本最多 USER_CACHE_TTL 秒后失效。
+USER_CACHE_TTL = 60
+user_cache = TTLCache(maxsize=1024, ttl=USER_CACHE_TTL)
+
+
+def invalidate_user(user_id):
+    user_cache.pop(int(user_id))
+
+
+@login_manager.user_loader
 def load_user(user_id):
-    return User.get_or_none(User.id == int(user_id))
+    user_id = int(user_id)
+    user = user_cache.get(user_id)
+    if user is None:
+        user = User.get_or_none(User.id == user_id)
+        if user is not None:
+            user_cache.set(user_id, user)
+    return user
 
 @app.route('/')
 @login_required
@@ -56,7 +167,11 @@ def register():
         password = request.form['password']
         if User.get_or_none(User.username == username):
             return render_template('register.html', error='用户名已存在')
-        User.create(username=username, password_hash=generate_password_hash(password))
+        try:
+            password_hash = password_hasher.hash(password)
+        except HashBusy:
+            return render_template('register.html', error='注册人数过多，请稍后再试'), 503
+        User.create(username=username, password_hash=password_hash)
         return redirect(url_for('login'))
     return render_template('register.html')
 
@@ -66,7 +181,16 @@ def login():
         username = request.form['username']
         password = request.form['password']
         user = User.get_or_none(User.username == username)
-        if user and check_password_hash(user.password_hash, password):
+        try:
+            verified = user is not None and password_hasher.verify(user.password_hash, password)
+            if verified and password_hasher.needs_rehash(user.password_hash):
+                # 哈希参数调整过：借这次登录拿到的明文按新参数重算
+                user.password_hash = password_hasher.hash(password)
+                user.save(only=[User.password_hash])
+                invalidate_user(user.id)
+        except HashBusy:
+            return render_template('login.html', error='登录人数过多，请稍后再试'), 503
+        if verified:
             login_user(user)
             return redirect(url_for('home'))
         return render_template('login.html', error='用户名或密码错误')
@@ -75,6 +199,7 @@ def login():
 @app.route('/logout')
 @login_required
 def logout():
+    invalidate_user(current_user.id)
     logout_user()
     return redirect(url_for('login'))
 
@@ -83,36 +208,88 @@ def logout():
 def search():
     movies = []
     query_year = ''
+    keyword = ''
     if request.method == 'POST':
-        year = request.form['year']
-        query_year = year
-        if year.isdigit():
-            year_int = int(year)
-            print(f"🧪 查询年份：{year_int}")
+        query_year = request.form.get('year', '').strip()
+        keyword = request.form.get('q', '').strip()
+        if keyword:
+            movies = search_movies_by_keyword(keyword)
+        elif query_year.isdecimal() and int(query_year) <= MAX_INTEGER:
+            movies = search_movies_by_year(int(query_year))
+    # 按年份查询没有结果时提示库中年份范围（来自缓存，不再每次扫描全表）
+    years = distinct_years() if query_year and not keyword and not movies else []
+    return render_template('search.html', movies=movies, year=query_year, q=keyword, years=years)
+
+@app.route(f'/collect/<int(min=1, max={MAX_INTEGER}):movie_id>', methods=['POST'])
+@login_required
+def collect(movie_id):
+    collect_movies(current_user.id, [movie_id])
+    return redirect(url_for('my_collection'))
+
+
+COLLECTION_BATCH_LIMIT = 500
 
-            all_years = [m.year for m in DoubanMovie.select()]
-            print("📅 数据库所有年份：", sorted(set(all_years)))
 
-            movies = DoubanMovie.select().where(DoubanMovie.year == year_int)
-            print(f"🔍 查询到电影数量：{len(movies)}")
-            for m in movies:
-                print(f"👉 {m.title} ({m.year})")
+def _is_movie_id(value):
+    # bool 是 int 的子类；超出 64 位整数的 id 会让数据库驱动抛 OverflowError
+    return isinstance(value, int) and not isinstance(value, bool) and 1 <= value <= MAX_INTEGER
 
-    return render_template('search.html', movies=movies, year=query_year)
 
-@app.route('/collect/<int:movie_id>', methods=['POST'])
+@app.route('/api/collection', methods=['POST'])
 @login_required
-def collect(movie_id):
-    movie = DoubanMovie.get_or_none(DoubanMovie.id == movie_id)
-    if movie:
-        Collection.get_or_create(user=current_user.id, movie=movie_id)
-    return redirect(url_for('my_collection'))
+def collection_api():
+    """批量收藏 / 取消收藏
+
+    请求体：{"add": [电影 id, ...], "remove": [电影 id, ...]}，两项都可省略；
+    返回 {"added": 新增条数, "removed": 删除条数}。
+    """
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify({'error': '请求体必须是 JSON 对象'}), 400
+    batches = {}
+    for name in ('add', 'remove'):
+        ids = payload.get(name, [])
+        if not isinstance(ids, list) or not all(_is_movie_id(i) for i in ids):
+            return jsonify({'error': f'{name} 必须是正整数 id 列表'}), 400
+        if len(ids) > COLLECTION_BATCH_LIMIT:
+            return jsonify({'error': f'{name} 最多 {COLLECTION_BATCH_LIMIT} 个 id'}), 400
+        batches[name] = sorted(set(ids))
+
+    added = removed = 0
+    with db.atomic():
+        if batches['add']:
+            added = collect_movies(current_user.id, batches['add'])
+        if batches['remove']:
+            removed = uncollect_movies(current_user.id, batches['remove'])
+    return jsonify({'added': added, 'removed': removed})
+
+COLLECTION_PAGE_SIZE = 20
+COLLECTION_MAX_PAGE = 10000  # 页码上限，避免超大 ?page= 产生数据库无法表示的 OFFSET
+
+
+def collection_page(user_id, page, per_page=COLLECTION_PAGE_SIZE):
+    """某用户收藏的一页（最新收藏在前），返回 (收藏列表, 是否还有下一页)
+
+    与 DoubanMovie 做 JOIN，一次查询同时取出电影标题和年份，模板访问 c.movie 不会再逐条查询。
+    """
+    query = (Collection
+             .select(Collection.id, Collection.movie, DoubanMovie.id, DoubanMovie.title, DoubanMovie.year)
+             .join(DoubanMovie)
+             .where(Collection.user == user_id)
+             .order_by(Collection.id.desc())
+             .offset((page - 1) * per_page)
+             .limit(per_page + 1))  # 多取一条判断是否还有下一页
+    collections = list(query)
+    return collections[:per_page], len(collections) > per_page
+
 
 @app.route('/my_collection')
 @login_required
 def my_collection():
-    collections = Collection.select().where(Collection.user == current_user.id)
-    return render_template('collection.html', collections=collections)
+    page = min(max(request.args.get('page', 1, type=int), 1), COLLECTION_MAX_PAGE)
+    collections, has_next = collection_page(current_user.id, page)
+    return render_template('collection.html', collections=collections, page=page, has_next=has_next)
+
 
 @app.route('/debug_movies')
 def debug_movies():
@@ -126,7 +303,41 @@ def debug_info():
     rows = db.execute_sql("SELECT COUNT(*) FROM douban_movie").fetchone()
     return f"✅ 当前连接数据库中共有 {rows[0]} 部电影"
 
+def init_db():
+    """建表并迁移旧表（启动服务前执行一次，不会破坏现有数据）
+
+    用户表和收藏表归本应用管理；电影表按 work3.py 入库所用的完整结构准备好，
+    收藏表的外键（MySQL）需要它先存在，之后 work3.py 可以直接增量入库。
+    """
+    with db.connection_context():
+        prepare_movie_table()
+        if Collection.table_exists():
+            removed = dedupe_collections()
+            if removed:
+                print(f"🧹 删除 {removed} 条重复收藏")
+            migrate_indexes(Collection)  # 旧表补上 (user, movie) 唯一索引
+        db.create_tables([User, Collection], safe=True)
+
+
+def create_app(config=None):
+    """生产环境入口（gunicorn "work8:create_app()" 或 python serve.py work8）
+
+    关闭调试模式；会话用环境变量 SECRET_KEY 签名（多进程、多机部署需一致）。
+    未设置 SECRET_KEY 时拒绝启动：仓库中的开发密钥是公开的，用它签名的会话可以被伪造。
+
+    并不是真正的应用工厂：路由注册在模块级的 app 上，这里修改并返回的就是这个单例，
+    每次调用改动的是同一份配置。每个进程只调用一次。
+    """
+    app.config['DEBUG'] = False
+    if os.environ.get('SECRET_KEY'):
+        app.secret_key = os.environ['SECRET_KEY']
+    app.config.update(config or {})
+    if app.secret_key == DEV_SECRET_KEY and not (app.debug or app.testing):
+        raise RuntimeError('生产环境必须设置环境变量 SECRET_KEY（仓库中的开发密钥是公开的）')
+    return app
+
+
 if __name__ == '__main__':
-    db.connect()
-    db.create_tables([User, DoubanMovie, Collection], safe=True)
-    app.run(debug=True)
\ No newline at end of file
+    # 开发服务器：单进程，调试模式默认关闭，设置 FLASK_DEBUG=1 时打开
+    init_db()
+    app.run(debug=os.environ.get('FLASK_DEBUG') == '1')